@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import List, Literal, Optional, Any
 
-from fastapi import FastAPI, Request, Query
+from fastapi import FastAPI, Request, Query, HTTPException
 from fastapi.concurrency import run_in_threadpool
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field, field_validator
 
 from src.synopsis_gen.generation.pipeline import generate_synopsis_docx
+from src.synopsis_gen.rag.encoders import warm_up, is_encoder_warm
+from src.synopsis_gen.jobs import JobQueue, QueueFull
+from src.synopsis_gen.artifacts import ARTIFACTS
+from src.synopsis_gen.config import EMBED_MODEL_NAME
 
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -22,6 +28,38 @@ templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
+jobs = JobQueue(store=ARTIFACTS)
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+def _on_warm_up_done(fut: asyncio.Future) -> None:
+    # ошибку прогрева не теряем: печатаем сразу и отдаём в /ready
+    error = "cancelled" if fut.cancelled() else fut.exception()
+    if error is not None:
+        app.state.warm_up_error = str(error)[:500]
+        print("Embedding model warm-up failed:", app.state.warm_up_error)
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    # грузим модель в фоне: сервер принимает запросы сразу, готовность видна через /ready
+    loop = asyncio.get_running_loop()
+    app.state.warm_up_error = None
+    app.state.warm_up = loop.run_in_executor(None, warm_up)
+    app.state.warm_up.add_done_callback(_on_warm_up_done)
+    loop.run_in_executor(None, ARTIFACTS.cleanup)
+
+
+@app.get("/ready")
+def ready() -> JSONResponse:
+    # готовность — только после успешного пробного encode, а не по факту загрузки модели
+    warm = is_encoder_warm()
+    return JSONResponse(
+        {"ready": warm, "embed_model": EMBED_MODEL_NAME, "error": getattr(app.state, "warm_up_error", None)},
+        status_code=200 if warm else 503,
+    )
+
 class SynopsisRequest(BaseModel):
     inn: str = Field(description="INN/MNN")
 
@@ -75,6 +113,28 @@ def apply_mode_defaults(req: SynopsisRequest) -> SynopsisRequest:
     return req
 
 
+def pipeline_kwargs(req: SynopsisRequest) -> dict:
+    return dict(
+        inn=req.inn,
+        indication=req.indication,
+        regimen=req.regimen,
+        mode=req.mode,
+        sponsor=req.sponsor,
+        study_number=req.study_number,
+        centers=req.centers,
+        test_product_name=req.test_product_name,
+        reference_product_name=req.reference_product_name,
+        seed_urls=req.seed_url or None,
+        local_synopsis_paths=req.local_synopsis,
+        use_cache=(not req.no_cache),
+        cvintra=req.cvintra,
+        power=req.power,
+        alpha=req.alpha,
+        gmr=req.gmr,
+        dropout=req.dropout,
+    )
+
+
 @app.get("/", include_in_schema=False)
 def home() -> FileResponse:
     return FileResponse(BASE_DIR / "index.html")
@@ -126,7 +186,6 @@ async def search(
         mode=mode,
         indication=indication,
         regimen=regimen,
-        out="synopsis.docx",
         sponsor=sponsor,
         study_number=to_int(study_number),
         centers=centers,
@@ -143,30 +202,66 @@ async def search(
     )
     req = apply_mode_defaults(req)
 
-    out_path = await run_in_threadpool(
-        generate_synopsis_docx,
-        inn=req.inn,
-        indication=req.indication,
-        regimen=req.regimen,
-        out_path=req.out,
-        mode=req.mode,
-        sponsor=req.sponsor,
-        study_number=req.study_number,
-        centers=req.centers,
-        test_product_name=req.test_product_name,
-        reference_product_name=req.reference_product_name,
-        seed_urls=req.seed_url or None,
-        local_synopsis_paths=req.local_synopsis,
-        use_cache=(not req.no_cache),
-        cvintra=req.cvintra,
-        power=req.power,
-        alpha=req.alpha,
-        gmr=req.gmr,
-        dropout=req.dropout,
+    # несгенерированные разделы помечены в документе; их список — в заголовках ответа
+    section_errors: dict = {}
+
+    def progress(stage: str, state: str, received: Optional[int] = None, **reports: Any) -> None:
+        section_errors.update(reports.get("section_errors") or {})
+
+    artifact_id = ARTIFACTS.new_id()
+    with ARTIFACTS.write(artifact_id) as tmp_path:
+        await run_in_threadpool(
+            generate_synopsis_docx,
+            out_path=tmp_path,
+            progress=progress,
+            **pipeline_kwargs(req),
+        )
+
+    headers = {}
+    if section_errors:
+        headers = {"X-Synopsis-Incomplete": "1", "X-Synopsis-Failed-Sections": ",".join(sorted(section_errors))}
+    return FileResponse(
+        path=ARTIFACTS.path_for(artifact_id),
+        headers=headers,
+        filename="synopsis.docx",
+        media_type=DOCX_MEDIA_TYPE,
+        background=BackgroundTask(ARTIFACTS.remove, artifact_id),
     )
 
+
+@app.post("/jobs", status_code=202)
+def create_job(req: SynopsisRequest) -> dict:
+    req = apply_mode_defaults(req)
+    try:
+        job = jobs.submit(generate_synopsis_docx, **pipeline_kwargs(req))
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str) -> FileResponse:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error or "Job failed")
+    if job.status != "done" or not job.result_path:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    # файл мог быть удалён вручную или при перезапуске — не отдаём 500 на отсутствующий путь
+    path = ARTIFACTS.get(job_id)
+    if path is None:
+        raise HTTPException(status_code=410, detail="Job result has expired")
     return FileResponse(
-        path=out_path,
+        path=path,
         filename="synopsis.docx",
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        media_type=DOCX_MEDIA_TYPE,
     )
\ No newline at end of file
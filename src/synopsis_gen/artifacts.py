@@ -0,0 +1,90 @@
+import os
+import re
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Set
+
+from src.synopsis_gen.config import ARTIFACTS_DIR, ARTIFACT_TTL_SECONDS, ARTIFACT_CLEANUP_INTERVAL, DEBUG
+
+_ID_RE = re.compile(r"^[a-zA-Z0-9_\-]+$")
+
+class ArtifactStore:
+    def __init__(self, root: str = ARTIFACTS_DIR, ttl: float = ARTIFACT_TTL_SECONDS, suffix: str = ".docx"):
+        self.root = root
+        self.ttl = ttl
+        self.suffix = suffix
+        self._last_cleanup = 0.0
+        # артефакты, сроком жизни которых управляет владелец (JobQueue): cleanup по mtime их не трогает
+        self._pinned: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def path_for(self, artifact_id: str) -> str:
+        if not _ID_RE.match(artifact_id or ""):
+            raise ValueError(f"Bad artifact id: {artifact_id!r}")
+        return os.path.join(self.root, artifact_id + self.suffix)
+
+    @contextmanager
+    def write(self, artifact_id: str) -> Iterator[str]:
+        # пишем во временный файл в той же директории и атомарно переименовываем:
+        # читатель видит либо готовый документ, либо ничего
+        final = self.path_for(artifact_id)
+        os.makedirs(self.root, exist_ok=True)
+        self.cleanup_if_due()
+        tmp = f"{final}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            yield tmp
+            os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def pin(self, artifact_id: str):
+        with self._lock:
+            self._pinned.add(artifact_id)
+
+    def unpin(self, artifact_id: str):
+        with self._lock:
+            self._pinned.discard(artifact_id)
+
+    def get(self, artifact_id: str) -> Optional[str]:
+        path = self.path_for(artifact_id)
+        return path if os.path.exists(path) else None
+
+    def remove(self, artifact_id: str):
+        path = self.path_for(artifact_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def cleanup(self) -> int:
+        if not os.path.isdir(self.root):
+            return 0
+        now, removed = time.time(), 0
+        with self._lock:
+            pinned = set(self._pinned)
+        for name in os.listdir(self.root):
+            if name.split(".", 1)[0] in pinned:
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.isfile(path) and now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if DEBUG and removed:
+            print("Artifacts removed:", removed)
+        return removed
+
+    def cleanup_if_due(self):
+        with self._lock:
+            if time.time() - self._last_cleanup < ARTIFACT_CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = time.time()
+        self.cleanup()
+
+ARTIFACTS = ArtifactStore()
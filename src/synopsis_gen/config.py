@@ -1,9 +1,23 @@
 import os
+from typing import Callable, Dict
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def parse_kv(spec: str, cast: Callable = str, lower: bool = False) -> Dict:
+    # списки вида "ключ=значение,ключ=значение"; пары с пустым или неприводимым значением пропускаются
+    out = {}
+    for part in (spec or "").split(","):
+        key, _, value = part.strip().partition("=")
+        key = key.strip().lower() if lower else key.strip()
+        try:
+            if key and value.strip():
+                out[key] = cast(value.strip())
+        except ValueError:
+            continue
+    return out
+
 YANDEX_CLOUD_API_KEY = os.getenv("YANDEX_CLOUD_API_KEY", "")
 YANDEX_FOLDER_ID = os.getenv("YANDEX_FOLDER_ID", "")
 YANDEX_MODEL_URI_TEMPLATE = os.getenv("YANDEX_MODEL_URI", "gpt://{folder_id}/yandexgpt/latest")
@@ -12,33 +26,136 @@ DEBUG = bool(int(os.getenv("DEBUG", "0")))
 
 # RAG cache
 CACHE_DIR = os.getenv("RAG_CACHE_DIR", ".rag_cache")
+CACHE_VERSION = 4
+# кэш эмбеддингов по хэшу текста чанка (пустое значение отключает)
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", os.path.join(CACHE_DIR, "_embeddings"))
+# потолок файла векторов на модель; при превышении вытесняются самые старые строки
+EMBED_CACHE_MAX_MB = float(os.getenv("EMBED_CACHE_MAX_MB", "2048"))
+RAG_CACHE_MAX_LAYERS = int(os.getenv("RAG_CACHE_MAX_LAYERS", "64"))
+RAG_EXTRA_TTL_SECONDS = float(os.getenv("RAG_EXTRA_TTL_SECONDS", str(7 * 86400)))
+# вытеснение слоёв — в фоне не чаще раза в RAG_EVICT_INTERVAL_SECONDS; слои, использованные за последние
+# RAG_EVICT_GRACE_SECONDS или загруженные в память процесса, не трогаются
+RAG_EVICT_INTERVAL_SECONDS = float(os.getenv("RAG_EVICT_INTERVAL_SECONDS", "600"))
+RAG_EVICT_GRACE_SECONDS = float(os.getenv("RAG_EVICT_GRACE_SECONDS", "900"))
+RAG_MEM_CACHE_MB = float(os.getenv("RAG_MEM_CACHE_MB", "1024"))
+# mmap действует только на IVF-индексы (инвертированные списки); Flat и HNSW грузятся в память процесса
+RAG_INDEX_MMAP = bool(int(os.getenv("RAG_INDEX_MMAP", "1")))
+
+# инкрементальное обновление кэша: раз в RAG_REFRESH_SECONDS корпус пересобирается и дозаливаются только изменения
+RAG_REFRESH_SECONDS = float(os.getenv("RAG_REFRESH_SECONDS", str(7 * 86400)))
+RAG_COMPACT_RATIO = float(os.getenv("RAG_COMPACT_RATIO", "0.2"))
 
 # RAG params
 EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# бэкенд энкодера: torch (SentenceTransformer) | onnx (ONNX Runtime, int8; нужен пакет onnxruntime)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# потоки внутри операций (0 — по умолчанию библиотеки)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR", os.path.join(CACHE_DIR, "_onnx"))
+# допустимый уход косинуса int8 от PyTorch; больше — используется fp32-граф
+EMBED_ONNX_MAX_DRIFT = float(os.getenv("EMBED_ONNX_MAX_DRIFT", "0.02"))
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "250"))
 TOP_K = int(os.getenv("TOP_K", "22"))
+# тип индекса FAISS: auto (по числу чанков) | flat | hnsw | ivf_flat | ivf_pq
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "auto")
+RAG_INDEX_HNSW_MIN = int(os.getenv("RAG_INDEX_HNSW_MIN", "20000"))
+RAG_INDEX_IVF_MIN = int(os.getenv("RAG_INDEX_IVF_MIN", "100000"))
+RAG_INDEX_PQ_MIN = int(os.getenv("RAG_INDEX_PQ_MIN", "1000000"))
+RAG_INDEX_TRAIN_SAMPLE = int(os.getenv("RAG_INDEX_TRAIN_SAMPLE", "50000"))
+RAG_INDEX_NPROBE = int(os.getenv("RAG_INDEX_NPROBE", "16"))
+RAG_INDEX_EF_SEARCH = int(os.getenv("RAG_INDEX_EF_SEARCH", "128"))
+EVIDENCE_DEDUPE_ACROSS = bool(int(os.getenv("EVIDENCE_DEDUPE_ACROSS", "0")))
+# бюджет evidence на раздел в токенах (оценка), переопределение по разделам: "a=2500,e=4000"
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "3000"))
+EVIDENCE_SECTION_BUDGETS = parse_kv(os.getenv("EVIDENCE_SECTION_BUDGETS", ""), int)
+EVIDENCE_MAX_PER_DOC = int(os.getenv("EVIDENCE_MAX_PER_DOC", "2"))
+# доля общих словесных шинглов, при которой фрагмент считается дублем уже отобранного
+EVIDENCE_DUP_THRESHOLD = float(os.getenv("EVIDENCE_DUP_THRESHOLD", "0.8"))
+# вес приоритета источника (как в списке литературы) относительно нормированной релевантности
+EVIDENCE_PRIORITY_WEIGHT = float(os.getenv("EVIDENCE_PRIORITY_WEIGHT", "0.3"))
+# поиск: hybrid (BM25 + FAISS, слияние RRF) | dense | bm25
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RRF_K = int(os.getenv("RRF_K", "60"))
+# сколько кандидатов берёт каждый ретривер перед слиянием: top_k * множитель
+RRF_CANDIDATES = int(os.getenv("RRF_CANDIDATES", "4"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
 
 # Corpus size
+# дедупликация корпуса перед кодированием: порог оценки Жаккара по MinHash (шинглы из 3 слов)
+DEDUP_NEAR_THRESHOLD = float(os.getenv("DEDUP_NEAR_THRESHOLD", "0.85"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))
 PUBMED_RETMX = int(os.getenv("PUBMED_RETMX", "24"))
 EUROPEPMC_PAGESIZE = int(os.getenv("EUROPEPMC_PAGESIZE", "24"))
 MAX_PMC_FULLTEXT = int(os.getenv("MAX_PMC_FULLTEXT", "8"))
 MAX_URL_FULLTEXT = int(os.getenv("MAX_URL_FULLTEXT", "18"))
 MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "240000"))
+# PDF: загрузка потоком во временный файл с лимитом размера, извлечение текста в пуле процессов
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(64 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "30"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+
+# Parallel fetching
+FETCH_MAX_IN_FLIGHT = int(os.getenv("FETCH_MAX_IN_FLIGHT", "12"))
+FETCH_PER_HOST = int(os.getenv("FETCH_PER_HOST", "4"))
+FETCH_HOST_LIMITS = {
+    host: max(1, n)
+    for host, n in parse_kv(os.getenv("FETCH_HOST_LIMITS", "eutils.ncbi.nlm.nih.gov=3,pmc.ncbi.nlm.nih.gov=3,www.ebi.ac.uk=4"), int, lower=True).items()
+}
+FETCH_SEARCH_DEADLINE = float(os.getenv("FETCH_SEARCH_DEADLINE", "90"))
+FETCH_ABSTRACTS_DEADLINE = float(os.getenv("FETCH_ABSTRACTS_DEADLINE", "180"))
+FETCH_FULLTEXT_DEADLINE = float(os.getenv("FETCH_FULLTEXT_DEADLINE", "240"))
 
-# NCBI
-PUBMED_EFETCH_BATCH = int(os.getenv("PUBMED_EFETCH_BATCH", "10"))
-PUBMED_MIN_DELAY = float(os.getenv("PUBMED_MIN_DELAY", "0.4"))
+# NCBI (E-utilities: 3 запроса/с без ключа, 10 запросов/с с API key)
+NCBI_API_KEY = os.getenv("NCBI_API_KEY", "")
+NCBI_RPS = float(os.getenv("NCBI_RPS", "9" if NCBI_API_KEY else "2.8"))
+# efetch по history server (WebEnv) методом POST: до 10000 записей за запрос, берём пачки по 200
+PUBMED_EFETCH_BATCH = int(os.getenv("PUBMED_EFETCH_BATCH", "200"))
 PUBMED_429_SLEEP = float(os.getenv("PUBMED_429_SLEEP", "3.0"))
 
 # HTTP
 HTTP_TIMEOUT = int(os.getenv("HTTP_TIMEOUT", "45"))
 HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
 HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "1.5"))
+# потолок паузы между повторами (с), пауза — случайная в [0.5, 1] от HTTP_BACKOFF^попытка
+HTTP_BACKOFF_CAP = float(os.getenv("HTTP_BACKOFF_CAP", "20"))
+# сколько хостов держат свой пул keep-alive соединений; размер пула — лимит хоста из FETCH_HOST_LIMITS
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+
+# HTTP response cache (пустой HTTP_CACHE_DIR отключает кэш)
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "1024"))
+HTTP_CACHE_TTLS = parse_kv(os.getenv(
+    "HTTP_CACHE_TTLS",
+    "eutils.ncbi.nlm.nih.gov=86400,www.ebi.ac.uk=86400,pmc.ncbi.nlm.nih.gov=604800,default=604800",
+), float, lower=True)
 
 # LLM
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.25"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "5200"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "5"))
+# потоковая генерация: частичный текст виден в прогрессе задачи, невалидный JSON обрывается до конца генерации
+LLM_STREAM = bool(int(os.getenv("LLM_STREAM", "1")))
+# сколько символов ответа ждать открывающую скобку JSON, прежде чем считать ответ невалидным
+LLM_JSON_PREFIX_CHARS = int(os.getenv("LLM_JSON_PREFIX_CHARS", "400"))
+# кэш ответов LLM (пустой LLM_CACHE_DIR отключает); no_cache в запросе — генерация заново, кэш не читается и не пишется
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 86400)))
 
 # bibliography
-BIBLIO_LIMIT = int(os.getenv("BIBLIO_LIMIT", "7"))
\ No newline at end of file
+BIBLIO_LIMIT = int(os.getenv("BIBLIO_LIMIT", "7"))
+
+# Jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "16"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+# Artifacts (rendered DOCX)
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", ".artifacts")
+ARTIFACT_TTL_SECONDS = float(os.getenv("ARTIFACT_TTL_SECONDS", "3600"))
+ARTIFACT_CLEANUP_INTERVAL = float(os.getenv("ARTIFACT_CLEANUP_INTERVAL", "300"))
\ No newline at end of file
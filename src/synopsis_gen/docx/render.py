@@ -9,6 +9,7 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from src.synopsis_gen.text_utils import clean_final_text
 from src.synopsis_gen.config import BIBLIO_LIMIT
 from src.synopsis_gen.rag.mini_rag import MiniRAG
+from src.synopsis_gen.rag.evidence import source_priority
 
 RED = RGBColor(0xC0, 0x00, 0x00)
 
@@ -51,34 +52,21 @@ def add_text_block(doc: Document, text: str):
         if not s:
             doc.add_paragraph("")
             continue
-        if s.startswith(("-", "•", "*")):
+        if s.startswith("НУЖНО УТОЧНИТЬ"):
+            rr = doc.add_paragraph().add_run(s)
+            rr.font.color.rgb = RED
+        elif s.startswith(("-", "•", "*")):
             doc.add_paragraph(s.lstrip("-•* ").strip(), style="List Bullet")
         else:
             doc.add_paragraph(s)
 
 def build_bibliography_from_rag(rag: MiniRAG, limit: int = BIBLIO_LIMIT) -> List[Dict]:
     bib, seen = [], set()
-    def score(m: Dict) -> int:
-        url = (m.get("url") or "").lower()
-        src = (m.get("source") or "")
-        s = 0
-        if src == "SYNOPSIS_DOCX":
-            s += 100
-        if url.endswith(".pdf"):
-            s += 40
-        if "ema.europa.eu" in url:
-            s += 35
-        if "pmc.ncbi.nlm.nih.gov" in url:
-            s += 25
-        if "pubmed.ncbi.nlm.nih.gov" in url:
-            s += 15
-        return s
     metas = []
-    for c in rag.chunks:
-        m = c.meta or {}
+    for m in rag.live_metas():
         if m.get("url"):
             metas.append(m)
-    metas.sort(key=score, reverse=True)
+    metas.sort(key=source_priority, reverse=True)
     for m in metas:
         url = m.get("url", "")
         if not url or url in seen:
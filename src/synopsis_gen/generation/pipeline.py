@@ -1,21 +1,31 @@
 import os
-import re
-from typing import List, Dict, Optional
-from tqdm import tqdm
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Set, Tuple
 
-from src.synopsis_gen.sources.pubmed import pubmed_search, pubmed_fetch_abstracts
+from src.synopsis_gen.sources.pubmed import pubmed_search, pubmed_fetch_abstracts, pubmed_url
 from src.synopsis_gen.sources.europepmc import europepmc_search
-from src.synopsis_gen.sources.fetchers import fetch_url_text
+from src.synopsis_gen.sources.fetchers import fetch_url_doc, pmc_fulltext_doc
 from src.synopsis_gen.sources.docx_ingest import docx_to_text
-from src.synopsis_gen.rag.mini_rag import MiniRAG
-from src.synopsis_gen.rag.cache import load_rag, save_rag
-from src.synopsis_gen.rag.mini_rag import evidence_block
+from src.synopsis_gen.sources.scheduler import SCHEDULER, host_of
+from src.synopsis_gen.rag.mini_rag import MiniRAG, doc_key
+from src.synopsis_gen.rag.cache import (
+    load_rag, save_rag, touch_rag, rag_cache_path, extras_fingerprint, schedule_rag_eviction,
+    rag_fingerprint, RAG_MEMORY,
+)
+from src.synopsis_gen.rag.evidence import evidence_blocks
+from src.synopsis_gen.rag.encoders import get_encoder
+from src.synopsis_gen.rag.dedup import dedupe_near_duplicates
 from src.synopsis_gen.llm.yandex_client import LLMClient
+from src.synopsis_gen.llm.response_cache import LLM_CACHE
 from src.synopsis_gen.generation.prompts import llm_part_a, llm_part_b_design, llm_part_d_schedule, llm_part_e_bio_stats, llm_part_c_safety
 from src.synopsis_gen.generation.sample_size import be_sample_size_2x2, apply_dropout
 from src.synopsis_gen.docx.render import render_docx, build_bibliography_from_rag
 from src.synopsis_gen.text_utils import clean_final_text, short_hash
-from src.synopsis_gen.config import PUBMED_RETMX, EUROPEPMC_PAGESIZE, MAX_PMC_FULLTEXT, MAX_URL_FULLTEXT, CACHE_DIR, DEBUG, TOP_K, BIBLIO_LIMIT
+from src.synopsis_gen.config import (
+    PUBMED_RETMX, EUROPEPMC_PAGESIZE, MAX_PMC_FULLTEXT, MAX_URL_FULLTEXT, DEBUG, TOP_K, BIBLIO_LIMIT, LLM_CONCURRENCY,
+    FETCH_SEARCH_DEADLINE, FETCH_ABSTRACTS_DEADLINE, FETCH_FULLTEXT_DEADLINE, RAG_REFRESH_SECONDS,
+)
 
 DEFAULT_SEED_URLS = {
     "palbociclib": [
@@ -43,7 +53,23 @@ DEFAULT_SEED_URLS = {
     ],
 }
 
-def collect_corpus(inn: str, extra_urls: Optional[List[str]], local_synopsis_paths: List[str]) -> List[Dict]:
+NCBI_HOST = "eutils.ncbi.nlm.nih.gov"
+EUROPEPMC_HOST = "www.ebi.ac.uk"
+
+# результат gather для упавшей или не успевшей задачи: пустой ответ источника и его недоступность — разные вещи
+_FAILED = object()
+
+def collect_corpus(
+    inn: str,
+    extra_urls: Optional[List[str]],
+    local_synopsis_paths: List[str],
+    failed: Optional[Set[str]] = None,
+    report: Optional[Dict] = None,
+) -> List[Dict]:
+    # failed — сюда добавляются ключи документов (doc_key), которые не удалось загрузить; если не ответил
+    # сам поиск и неизвестно, каких документов нет, — имя источника целиком (поле "source" документов);
+    # report — отчёт дедупликации корпуса
+    failed = failed if failed is not None else set()
     inn_q = inn.strip()
     if not inn_q:
         return []
@@ -53,19 +79,38 @@ def collect_corpus(inn: str, extra_urls: Optional[List[str]], local_synopsis_pat
         f'({inn_q}[Title/Abstract]) AND (bioequivalence OR "relative bioavailability" OR "food effect")',
         f'({inn_q}[Title/Abstract]) AND (safety OR adverse events OR toxicity OR interaction)',
     ]
-    pmids = []
-    for q in pubmed_queries:
-        pmids += pubmed_search(q, retmax=max(8, PUBMED_RETMX // 2))
-    pmids = list(dict.fromkeys(pmids))[:PUBMED_RETMX]
-    docs = pubmed_fetch_abstracts(pmids)
-
-    ep_hits = []
-    for q in [
+    ep_queries = [
         f'{inn_q} (pharmacokinetics OR absorption OR AUC OR Cmax OR Tmax OR "half-life")',
         f'{inn_q} (bioequivalence OR "food effect" OR "relative bioavailability")',
         f'{inn_q} (safety OR adverse events OR toxicity OR interaction)',
-    ]:
-        ep_hits += europepmc_search(q, page_size=max(10, EUROPEPMC_PAGESIZE // 2))
+    ]
+
+    urls = []
+    urls += DEFAULT_SEED_URLS.get(inn_q.lower(), [])
+    if extra_urls:
+        urls += extra_urls
+    urls = list(dict.fromkeys([u.strip() for u in urls if u and u.strip()]))[:MAX_URL_FULLTEXT]
+
+    # поиск и seed URL не зависят друг от друга — ставим всё сразу, лимиты по хостам держит планировщик;
+    # сроки FETCH_*_DEADLINE отсчитываются от начала сбора
+    started = time.monotonic()
+    pm_fut = SCHEDULER.submit(NCBI_HOST, pubmed_search, pubmed_queries, retmax=PUBMED_RETMX)
+    ep_futs = [SCHEDULER.submit(EUROPEPMC_HOST, europepmc_search, q, page_size=max(10, EUROPEPMC_PAGESIZE // 2)) for q in ep_queries]
+    url_futs = [SCHEDULER.submit(host_of(u), fetch_url_doc, u) for u in urls]
+
+    search = SCHEDULER.gather([pm_fut], deadline=FETCH_SEARCH_DEADLINE, default=_FAILED, since=started)[0]
+    if search is _FAILED:
+        failed.add("PubMed")
+        search = {}
+    abs_fut = SCHEDULER.submit(NCBI_HOST, pubmed_fetch_abstracts, search or [])
+
+    ep_hits = []
+    for hits in SCHEDULER.gather(ep_futs, deadline=FETCH_SEARCH_DEADLINE, default=_FAILED, since=started):
+        if hits is _FAILED:
+            # без части выдачи EuropePMC неполон и список полных текстов PMC
+            failed.update(("EuropePMC", "PMC"))
+            continue
+        ep_hits += hits
 
     seen = set()
     ep_uniq = []
@@ -75,29 +120,65 @@ def collect_corpus(inn: str, extra_urls: Optional[List[str]], local_synopsis_pat
             continue
         seen.add(key)
         ep_uniq.append(d)
+
+    pmcids = [d.get("pmcid") for d in ep_uniq if d.get("pmcid")]
+    pmcids = list(dict.fromkeys(pmcids))[:MAX_PMC_FULLTEXT]
+    pmc_futs = [SCHEDULER.submit(EUROPEPMC_HOST, pmc_fulltext_doc, pmcid) for pmcid in pmcids]
+
+    abstracts = SCHEDULER.gather([abs_fut], deadline=FETCH_ABSTRACTS_DEADLINE, default=_FAILED, since=started)[0]
+    if abstracts is _FAILED:
+        abstracts = []
+    # найденные, но не полученные статьи — сбой efetch; удалять их из кэша нельзя
+    got = {d.get("id", "") for d in abstracts}
+    failed.update(
+        doc_key({"source": "PubMed", "id": p, "url": pubmed_url(p)})
+        for p in (search or {}).get("ids", []) if p not in got
+    )
+    docs = list(abstracts)
     docs += ep_uniq
 
-    pmc_urls = []
-    for d in ep_uniq:
-        pmcid = d.get("pmcid") or ""
-        if pmcid:
-            pmc_urls.append(f"https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/")
-    pmc_urls = list(dict.fromkeys(pmc_urls))[:MAX_PMC_FULLTEXT]
-    for u in tqdm(pmc_urls, desc="Fetching PMC fulltext"):
-        txt = fetch_url_text(u)
-        if txt:
-            docs.append({"source": "PMC", "id": short_hash(u), "title": f"PMC Fulltext: {u}", "year": "", "url": u, "text": txt})
+    for pmcid, ft in zip(pmcids, SCHEDULER.gather(pmc_futs, deadline=FETCH_FULLTEXT_DEADLINE, default=_FAILED, since=started)):
+        u = f"https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/"
+        d = {"source": "PMC", "id": short_hash(u), "title": f"PMC Fulltext: {u}", "year": "", "url": u, "pmcid": pmcid}
+        if ft is _FAILED or not ft:
+            # у статьи с PMCID всегда есть XML или HTML-страница — пустой ответ означает сбой загрузки
+            failed.add(doc_key(d))
+            continue
+        docs.append({**d, **ft})
 
-    urls = []
-    urls += DEFAULT_SEED_URLS.get(inn_q.lower(), [])
-    if extra_urls:
-        urls += extra_urls
-    urls = list(dict.fromkeys([u.strip() for u in urls if u and u.strip()]))[:MAX_URL_FULLTEXT]
-    for u in tqdm(urls, desc="Fetching seed URLs"):
-        txt = fetch_url_text(u)
-        if txt:
-            docs.append({"source": "URL", "id": short_hash(u), "title": f"Source: {u}", "year": "", "url": u, "text": txt})
+    docs += _url_docs(urls, url_futs, failed, since=started)
+    docs += _local_docs(local_synopsis_paths)
+    return _dedupe_docs(docs, report)
 
+def collect_extra_docs(
+    inn: str,
+    extra_urls: Optional[List[str]],
+    local_synopsis_paths: List[str],
+    failed: Optional[Set[str]] = None,
+    report: Optional[Dict] = None,
+) -> List[Dict]:
+    # только источники конкретного запроса; seed URL по умолчанию уже лежат в базовом корпусе МНН
+    defaults = DEFAULT_SEED_URLS.get(inn.strip().lower(), [])
+    urls = [u.strip() for u in extra_urls or [] if u and u.strip() and u.strip() not in defaults]
+    urls = list(dict.fromkeys(urls))[:max(0, MAX_URL_FULLTEXT - len(defaults))]
+    started = time.monotonic()
+    url_futs = [SCHEDULER.submit(host_of(u), fetch_url_doc, u) for u in urls]
+    return _dedupe_docs(_url_docs(urls, url_futs, failed, since=started) + _local_docs(local_synopsis_paths), report)
+
+def _url_docs(urls: List[str], futs: List, failed: Optional[Set[str]] = None, since: Optional[float] = None) -> List[Dict]:
+    docs = []
+    for u, got in zip(urls, SCHEDULER.gather(futs, deadline=FETCH_FULLTEXT_DEADLINE, since=since)):
+        d = {"source": "URL", "id": short_hash(u), "title": f"Source: {u}", "year": "", "url": u}
+        if got:
+            # у статьи PMC вместе с текстом приходят разделы JATS и pmcid
+            docs.append({**d, **got})
+        elif failed is not None:
+            # недоступный URL сохраняет в кэше только свой документ
+            failed.add(doc_key(d))
+    return docs
+
+def _local_docs(local_synopsis_paths: List[str]) -> List[Dict]:
+    docs = []
     for fp in local_synopsis_paths:
         if fp and os.path.exists(fp):
             txt = docx_to_text(fp)
@@ -110,34 +191,202 @@ def collect_corpus(inn: str, extra_urls: Optional[List[str]], local_synopsis_pat
                     "url": fp,
                     "text": txt
                 })
+    return docs
 
+def _dedupe_docs(docs: List[Dict], report: Optional[Dict] = None) -> List[Dict]:
     uniq = {}
     for d in docs:
         key = (d.get("source",""), d.get("id",""), d.get("url",""))
         if key not in uniq and d.get("text"):
             uniq[key] = d
-    return list(uniq.values())
+    # одна статья из PubMed, EuropePMC и PMC — один документ (самая полная версия)
+    kept, stats = dedupe_near_duplicates(list(uniq.values()))
+    if report is not None:
+        report.update(stats)
+    return kept
 
 # ==========================
 # Pipeline
 # ==========================
-def build_or_load_rag(inn: str, extra_urls: Optional[List[str]], local_synopsis_paths: List[str], use_cache: bool = True) -> MiniRAG:
-    cdir = os.path.join(CACHE_DIR, re.sub(r"[^a-zA-Z0-9_\-]+", "_", inn.strip().lower()))
-    if use_cache:
-        rag = load_rag(cdir)
-        if rag is not None:
+# progress(stage, state) или, для потоковой генерации раздела, progress(stage, "streaming", received_chars);
+# отчёты — именованными аргументами: по завершении retrieval — evidence=бюджет токенов по разделам,
+# после сбора корпуса слоя — dedup={слой: отчёт дедупликации}, при сбое раздела — section_errors={раздел: ошибка}
+Progress = Optional[Callable[..., None]]
+
+def _notify(progress: Progress, stage: str, state: str, received: Optional[int] = None, **reports):
+    if progress is not None:
+        if reports:
+            progress(stage, state, **reports)
+        elif received is None:
+            progress(stage, state)
+        else:
+            progress(stage, state, received)
+
+def _load_or_build_layer(cdir: str, collect: Callable[[Set[str], Dict], List[Dict]], model, inputs: Dict, progress: Progress) -> Tuple[MiniRAG, bool]:
+    rag = load_rag(cdir, model=model)
+    if rag is not None and rag.docs and time.time() - rag.refreshed_at >= RAG_REFRESH_SECONDS:
+        # срок истёк у экземпляра в памяти — возможно, слой уже обновил другой воркер: перечитываем указатель
+        RAG_MEMORY.forget(cdir)
+        rag = load_rag(cdir, model=model)
+    if rag is not None and rag.docs:
+        if time.time() - rag.refreshed_at < RAG_REFRESH_SECONDS:
+            touch_rag(cdir)
             if DEBUG:
                 print("Loaded RAG cache:", cdir, "chunks:", len(rag.chunks))
-            return rag
-    corpus = collect_corpus(inn, extra_urls=extra_urls, local_synopsis_paths=local_synopsis_paths)
-    rag = MiniRAG()
-    rag.add_documents(corpus)
-    if use_cache:
-        save_rag(rag, cdir)
+            return rag, False
+
+        # срок истёк: пересобираем корпус (в основном из HTTP-кэша) и кодируем только изменения;
+        # общий экземпляр читают другие запросы, поэтому дозаливаем в собственную копию
+        rag = load_rag(cdir, model=model, shared=False)
+        _notify(progress, "corpus", "running")
+        failed: Set[str] = set()
+        dedup: Dict = {}
+        corpus = collect(failed, dedup)
+        _notify(progress, "corpus", "running", dedup={os.path.basename(cdir): dedup})
+        # не загрузившиеся документы не удаляем: сбой одного URL или статьи не должен стирать её из корпуса,
+        # а не ответивший поиск — всю часть источника. источник, не вернувший ни одного документа,
+        # хотя в кэше они есть, тоже считаем недоступным целиком
+        present = {d.get("source", "") for d in corpus}
+        failed |= {k.split("|", 1)[0] for k in rag.docs} - present
+        _notify(progress, "embedding", "running")
+        added, removed = rag.update_documents(corpus, keep=failed)
+        if DEBUG:
+            print(f"Updated RAG cache: {cdir} added: {added} removed: {removed} chunks: {len(rag.chunks)}")
+            if failed:
+                print("Unavailable, cached documents kept:", ", ".join(sorted(failed))[:500])
+    else:
+        _notify(progress, "corpus", "running")
+        dedup = {}
+        corpus = collect(set(), dedup)
+        _notify(progress, "corpus", "running", dedup={os.path.basename(cdir): dedup})
+        _notify(progress, "embedding", "running")
+        rag = MiniRAG(model=model)
+        rag.add_documents(corpus)
+    if rag.index is not None:
+        save_rag(rag, cdir, inputs=inputs)
         if DEBUG:
             print("Saved RAG cache:", cdir)
+    return rag, True
+
+def build_or_load_rag(inn: str, extra_urls: Optional[List[str]], local_synopsis_paths: List[str], use_cache: bool = True, progress: Progress = None) -> MiniRAG:
+    model = get_encoder()
+    if not use_cache:
+        _notify(progress, "corpus", "running")
+        dedup: Dict = {}
+        corpus = collect_corpus(inn, extra_urls=extra_urls, local_synopsis_paths=local_synopsis_paths, report=dedup)
+        _notify(progress, "corpus", "done", dedup={"base": dedup})
+        _notify(progress, "embedding", "running")
+        rag = MiniRAG(model=model)
+        rag.add_documents(corpus)
+        _notify(progress, "embedding", "done")
+        return rag
+
+    # базовый корпус МНН общий для всех запросов; seed URL и локальные синопсисы — отдельный слой поверх него
+    layer_dirs = [rag_cache_path(inn)]
+    built = [_load_or_build_layer(
+        layer_dirs[0],
+        lambda failed, report: collect_corpus(inn, extra_urls=None, local_synopsis_paths=[], failed=failed, report=report),
+        model,
+        {"inn": inn.strip().lower()},
+        progress,
+    )]
+    want_urls = [u.strip() for u in extra_urls or [] if u and u.strip()]
+    want_local = [fp for fp in local_synopsis_paths if fp]
+    if want_urls or want_local:
+        layer_dirs.append(rag_cache_path(inn, layer="extra-" + extras_fingerprint(want_urls, want_local)))
+        built.append(_load_or_build_layer(
+            layer_dirs[1],
+            lambda failed, report: collect_extra_docs(inn, want_urls, want_local, failed=failed, report=report),
+            model,
+            {"seed_urls": want_urls, "local_synopses": want_local},
+            progress,
+        ))
+    state = "done" if any(b for _, b in built) else "cached"
+    _notify(progress, "corpus", state)
+    _notify(progress, "embedding", state)
+    schedule_rag_eviction()
+    layers = [r for r, _ in built]
+    if len(layers) == 1:
+        return layers[0]
+    keys = [rag_fingerprint(cdir) for cdir in layer_dirs]
+    key = "|".join(keys) if all(keys) else None
+    rag = RAG_MEMORY.get(key)
+    if rag is None:
+        rag = MiniRAG.merged(layers)
+        RAG_MEMORY.put(key, rag)
     return rag
 
+SECTION_GENERATORS = {
+    "a": llm_part_a,
+    "b": llm_part_b_design,
+    "d": llm_part_d_schedule,
+    "e": llm_part_e_bio_stats,
+    "c": llm_part_c_safety,
+}
+
+# раздел, который не удалось сгенерировать, не должен выглядеть в документе пустым или готовым
+SECTION_FAILED_MARK = "НУЖНО УТОЧНИТЬ: раздел не сгенерирован"
+
+SECTION_TEXT_FIELDS = {
+    "a": ["rationale", "drug_profile"],
+    "b": ["population", "treatments", "schedule_brief"],
+    "d": ["schedule"],
+    "e": ["bioanalytics", "statistics", "sample_size_template"],
+    "c": ["randomization", "safety", "ethics", "data_quality", "risks_limits"],
+}
+
+def failed_section(key: str) -> Dict:
+    out: Dict = {k: SECTION_FAILED_MARK for k in SECTION_TEXT_FIELDS[key]}
+    if key == "a":
+        out["objectives"] = {"primary": SECTION_FAILED_MARK, "secondary": SECTION_FAILED_MARK}
+    elif key == "b":
+        out["design"] = {"type": SECTION_FAILED_MARK}
+        out["inclusion"] = [SECTION_FAILED_MARK]
+        out["exclusion"] = [SECTION_FAILED_MARK]
+    return out
+
+def generate_sections(
+    llm: LLMClient,
+    inn: str,
+    indication: str,
+    regimen: str,
+    evidence: Dict[str, str],
+    mode: str,
+    max_workers: int = LLM_CONCURRENCY,
+    progress: Progress = None,
+) -> Dict[str, Dict]:
+    # упавший раздел заполняется SECTION_FAILED_MARK, ошибка уходит в progress(..., section_errors={раздел: текст})
+    errors: Dict[str, Exception] = {}
+
+    def run(key: str) -> Dict:
+        stage = f"section_{key}"
+        _notify(progress, stage, "running")
+        try:
+            out = SECTION_GENERATORS[key](
+                llm, inn, indication, regimen, evidence[key], mode=mode,
+                on_partial=lambda text: _notify(progress, stage, "streaming", len(text)),
+            )
+        except Exception as e:
+            errors[key] = e
+            _notify(progress, stage, "failed", section_errors={key: str(e)[:500]})
+            if DEBUG:
+                print(f"Section {key} failed:", str(e)[:200])
+            return failed_section(key)
+        _notify(progress, stage, "done")
+        return out
+
+    if max_workers <= 1:
+        out = {k: run(k) for k in SECTION_GENERATORS}
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(SECTION_GENERATORS))) as ex:
+            futs = {k: ex.submit(run, k) for k in SECTION_GENERATORS}
+            out = {k: f.result() for k, f in futs.items()}
+
+    # если упали все разделы, это не частичный сбой (ключ API, сеть) — пробрасываем
+    if len(errors) == len(SECTION_GENERATORS):
+        raise next(iter(errors.values()))
+    return out
+
 def generate_synopsis_docx(
     inn: str,
     indication: str,
@@ -157,22 +406,27 @@ def generate_synopsis_docx(
     alpha: float = 0.05,
     gmr: float = 0.95,
     dropout: float = 0.10,
+    progress: Progress = None,
 ) -> str:
     local_synopsis_paths = local_synopsis_paths or []
-    rag = build_or_load_rag(inn, extra_urls=seed_urls, local_synopsis_paths=local_synopsis_paths, use_cache=use_cache)
-    llm = LLMClient()
+    rag = build_or_load_rag(inn, extra_urls=seed_urls, local_synopsis_paths=local_synopsis_paths, use_cache=use_cache, progress=progress)
+    llm = LLMClient(use_cache=use_cache)
 
-    ev_a = evidence_block(rag, f"{inn} {indication} {regimen} rationale pharmacokinetics absorption food effect interactions safety mechanism", top_k=TOP_K)
-    ev_b = evidence_block(rag, f"{inn} {indication} {regimen} study design crossover 2x2 washout sequence TR RT randomization blinding fed fasted", top_k=TOP_K)
-    ev_d = evidence_block(rag, f"{inn} {indication} {regimen} schedule visits procedures pharmacokinetics sampling timepoints hospitalization", top_k=TOP_K)
-    ev_e = evidence_block(rag, f"{inn} {indication} {regimen} LC-MS/MS bioanalytical validation stability LLOQ statistics ANOVA TOST sample size CV", top_k=TOP_K)
-    ev_c = evidence_block(rag, f"{inn} {indication} {regimen} safety adverse events monitoring labs ECG ethics GCP data quality monitoring risks", top_k=TOP_K)
+    _notify(progress, "retrieval", "running")
+    evidence_report: Dict[str, Dict] = {}
+    evidence = evidence_blocks(rag, {
+        "a": f"{inn} {indication} {regimen} rationale pharmacokinetics absorption food effect interactions safety mechanism",
+        "b": f"{inn} {indication} {regimen} study design crossover 2x2 washout sequence TR RT randomization blinding fed fasted",
+        "d": f"{inn} {indication} {regimen} schedule visits procedures pharmacokinetics sampling timepoints hospitalization",
+        "e": f"{inn} {indication} {regimen} LC-MS/MS bioanalytical validation stability LLOQ statistics ANOVA TOST sample size CV",
+        "c": f"{inn} {indication} {regimen} safety adverse events monitoring labs ECG ethics GCP data quality monitoring risks",
+    }, top_k=TOP_K, report=evidence_report)
+    _notify(progress, "retrieval", "done", evidence=evidence_report)
 
-    a = llm_part_a(llm, inn, indication, regimen, ev_a, mode=mode)
-    b = llm_part_b_design(llm, inn, indication, regimen, ev_b, mode=mode)
-    d = llm_part_d_schedule(llm, inn, indication, regimen, ev_d, mode=mode)
-    e = llm_part_e_bio_stats(llm, inn, indication, regimen, ev_e, mode=mode)
-    c = llm_part_c_safety(llm, inn, indication, regimen, ev_c, mode=mode)
+    sections = generate_sections(llm, inn, indication, regimen, evidence, mode=mode, progress=progress)
+    if DEBUG and LLM_CACHE is not None:
+        print("LLM cache:", LLM_CACHE.stats())
+    a, b, d, e, c = (sections[k] for k in ["a", "b", "d", "e", "c"])
 
     for k in ["rationale", "drug_profile", "study_title", "phase"]:
         if k in a:
@@ -243,4 +497,7 @@ def generate_synopsis_docx(
         "study_title": a.get("study_title") or "",
     }
 
-    return render_docx(inn, meta, a, b, d, e, c, bib, out_path, sample_size_text)
\ No newline at end of file
+    _notify(progress, "render", "running")
+    out = render_docx(inn, meta, a, b, d, e, c, bib, out_path, sample_size_text)
+    _notify(progress, "render", "done")
+    return out
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Callable, Dict, Optional
 
 from src.synopsis_gen.llm.yandex_client import LLMClient
 from src.synopsis_gen.llm.json_utils import llm_json
@@ -19,7 +19,7 @@ def _mode_constraints(mode: str, inn: str) -> str:
         "и безопасность однократного/кратковременного дозирования."
     )
 
-def llm_part_a(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str) -> Dict:
+def llm_part_a(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str, on_partial: Optional[Callable[[str], None]] = None) -> Dict:
     system = (
         "Ты — медицинский писатель и клинический фармаколог. "
         "Пиши строго на русском. Не вставляй английские фразы. "
@@ -53,9 +53,9 @@ def llm_part_a(llm: LLMClient, inn: str, indication: str, regimen: str, evidence
 EVIDENCE:
 {evidence}
 """.strip()
-    return llm_json(llm, system, user)
+    return llm_json(llm, system, user, on_partial=on_partial)
 
-def llm_part_b_design(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str) -> Dict:
+def llm_part_b_design(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str, on_partial: Optional[Callable[[str], None]] = None) -> Dict:
     system = (
         "Ты — медицинский писатель/координатор клинических исследований. "
         "Пиши строго на русском. Без английских вставок. "
@@ -116,9 +116,9 @@ def llm_part_b_design(llm: LLMClient, inn: str, indication: str, regimen: str, e
 EVIDENCE:
 {evidence}
 """.strip()
-    return llm_json(llm, system, user)
+    return llm_json(llm, system, user, on_partial=on_partial)
 
-def llm_part_d_schedule(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str) -> Dict:
+def llm_part_d_schedule(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str, on_partial: Optional[Callable[[str], None]] = None) -> Dict:
     system = (
         "Ты — клинический координатор и фармакокинетик. Пиши строго на русском. "
         "Сделай очень подробный раздел 'План процедур и график отбора проб' как в синопсисах. "
@@ -147,9 +147,9 @@ def llm_part_d_schedule(llm: LLMClient, inn: str, indication: str, regimen: str,
 EVIDENCE:
 {evidence}
 """.strip()
-    return llm_json(llm, system, user)
+    return llm_json(llm, system, user, on_partial=on_partial)
 
-def llm_part_e_bio_stats(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str) -> Dict:
+def llm_part_e_bio_stats(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str, on_partial: Optional[Callable[[str], None]] = None) -> Dict:
     system = (
         "Ты — руководитель биоаналитики и биостатистик. Пиши строго на русском. "
         "Не используй английские вставки. Не используй слово 'черновик'. "
@@ -178,9 +178,9 @@ def llm_part_e_bio_stats(llm: LLMClient, inn: str, indication: str, regimen: str
 EVIDENCE:
 {evidence}
 """.strip()
-    return llm_json(llm, system, user)
+    return llm_json(llm, system, user, on_partial=on_partial)
 
-def llm_part_c_safety(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str) -> Dict:
+def llm_part_c_safety(llm: LLMClient, inn: str, indication: str, regimen: str, evidence: str, mode: str, on_partial: Optional[Callable[[str], None]] = None) -> Dict:
     system = (
         "Ты — специалист по безопасности, этике и качеству клинических исследований. "
         "Пиши строго на русском. Без английских вставок. "
@@ -212,4 +212,4 @@ def llm_part_c_safety(llm: LLMClient, inn: str, indication: str, regimen: str, e
 EVIDENCE:
 {evidence}
 """.strip()
-    return llm_json(llm, system, user)
\ No newline at end of file
+    return llm_json(llm, system, user, on_partial=on_partial)
\ No newline at end of file
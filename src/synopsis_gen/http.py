@@ -1,52 +1,180 @@
 import time
+import random
 from typing import Dict, Optional
 import requests
+from requests.adapters import HTTPAdapter
 
-from .config import HTTP_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, PUBMED_429_SLEEP, DEBUG
+from .config import (
+    HTTP_TIMEOUT, HTTP_RETRIES, HTTP_BACKOFF, HTTP_BACKOFF_CAP, HTTP_POOL_HOSTS, PUBMED_429_SLEEP, NCBI_API_KEY,
+    FETCH_PER_HOST, FETCH_HOST_LIMITS, LLM_CONCURRENCY, DEBUG,
+)
+from .ratelimit import NCBI_LIMITER, TokenBucket
+from .http_cache import HTTP_CACHE
 
-SESSION = requests.Session()
-SESSION.headers.update({"User-Agent": "SynopsisRAG/FINAL (educational prototype)"})
+USER_AGENT = "SynopsisRAG/FINAL (educational prototype)"
+# временные ответы: повторяем; прочие 4xx (404, 403, 410...) окончательные
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
 
-def _sleep_backoff(attempt: int):
-    time.sleep((HTTP_BACKOFF ** attempt) + 0.05)
+def _make_session() -> requests.Session:
+    # пул соединений на хост размером с его лимит параллельности: потоки планировщика не открывают
+    # новых TCP/TLS-соединений и не выбрасывают лишние из пула; повторы делаем сами
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    default = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=max(FETCH_PER_HOST, LLM_CONCURRENCY), max_retries=0)
+    session.mount("https://", default)
+    session.mount("http://", default)
+    for host, limit in FETCH_HOST_LIMITS.items():
+        session.mount(f"https://{host}/", HTTPAdapter(pool_connections=1, pool_maxsize=limit, max_retries=0))
+    return session
+
+SESSION = _make_session()
+
+def is_retryable_status(status: int) -> bool:
+    return status in RETRYABLE_STATUS
+
+def is_retryable_error(e: Exception) -> bool:
+    # таймауты и обрывы соединения — временные; неверный URL, схема, цикл редиректов — нет
+    return isinstance(e, (requests.Timeout, requests.ConnectionError)) and not isinstance(e, requests.exceptions.InvalidURL)
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), HTTP_BACKOFF_CAP)
+    return random.uniform(0.5, 1.0) * min(HTTP_BACKOFF_CAP, HTTP_BACKOFF ** (attempt + 1))
+
+def cached_get(url: str, params: Optional[Dict] = None, timeout: int = HTTP_TIMEOUT, limiter: Optional[TokenBucket] = None) -> requests.Response:
+    entry, fresh = HTTP_CACHE.lookup(url, params) if HTTP_CACHE else (None, False)
+    if fresh:
+        return entry.response()
+    if limiter is not None:
+        limiter.acquire()
+    r = SESSION.get(url, params=params, timeout=timeout, headers=entry.validators() if entry else None)
+    if HTTP_CACHE is None:
+        return r
+    if r.status_code == 304 and entry is not None:
+        HTTP_CACHE.revalidate(entry)
+        return entry.response()
+    HTTP_CACHE.store(url, params, r, keep=r.status_code == 200 and bool(r.content))
+    return r
 
 def safe_get(url: str, timeout: int = HTTP_TIMEOUT) -> Optional[requests.Response]:
     for attempt in range(HTTP_RETRIES):
+        retry_after = None
         try:
-            r = SESSION.get(url, timeout=timeout)
+            r = cached_get(url, timeout=timeout)
             if r.status_code == 200 and (r.text or r.content):
                 return r
             if DEBUG:
                 print("GET failed:", r.status_code, url)
+            if r.status_code != 200 and not is_retryable_status(r.status_code):
+                return None
+            retry_after = r.headers.get("Retry-After")
         except Exception as e:
             if DEBUG:
                 print("GET exception:", str(e)[:200], url)
-        _sleep_backoff(attempt)
+            if not is_retryable_error(e):
+                return None
+        if attempt + 1 < HTTP_RETRIES:
+            time.sleep(backoff_delay(attempt, retry_after))
     return None
 
-def safe_post(url: str, headers: Dict, payload: Dict, timeout: int = 180) -> requests.Response:
+def download_to_file(url: str, path: str, max_bytes: int, timeout: int = HTTP_TIMEOUT, headers: Optional[Dict] = None) -> Optional[requests.Response]:
+    # потоковая загрузка в файл: в памяти только текущий кусок; больше max_bytes — обрываем.
+    # возвращает ответ (заголовки, статус 200 или 304 на условный запрос) или None
+    for attempt in range(HTTP_RETRIES):
+        retry_after = None
+        try:
+            with SESSION.get(url, timeout=timeout, stream=True, headers=headers) as r:
+                if r.status_code == 304 and headers:
+                    return r
+                if r.status_code == 200:
+                    declared = r.headers.get("Content-Length")
+                    if declared and declared.isdigit() and int(declared) > max_bytes:
+                        if DEBUG:
+                            print(f"Download too large ({int(declared) / 1e6:.1f} MB):", url)
+                        return None
+                    size = 0
+                    with open(path, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=256 * 1024):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                if DEBUG:
+                                    print(f"Download exceeded {max_bytes / 1e6:.1f} MB:", url)
+                                return None
+                            f.write(chunk)
+                    return r if size > 0 else None
+                if DEBUG:
+                    print("GET failed:", r.status_code, url)
+                if not is_retryable_status(r.status_code):
+                    return None
+                retry_after = r.headers.get("Retry-After")
+        except Exception as e:
+            if DEBUG:
+                print("GET exception:", str(e)[:200], url)
+            if not is_retryable_error(e):
+                return None
+        if attempt + 1 < HTTP_RETRIES:
+            time.sleep(backoff_delay(attempt, retry_after))
+    return None
+
+def safe_post(url: str, headers: Dict, payload: Dict, timeout: int = 180, stream: bool = False) -> requests.Response:
     last_exc = None
     for attempt in range(HTTP_RETRIES):
+        retry_after = None
         try:
-            return SESSION.post(url, headers=headers, json=payload, timeout=timeout)
+            r = SESSION.post(url, headers=headers, json=payload, timeout=timeout, stream=stream)
+            if not is_retryable_status(r.status_code) or attempt + 1 == HTTP_RETRIES:
+                return r
+            if DEBUG:
+                print("POST retryable status:", r.status_code)
+            retry_after = r.headers.get("Retry-After")
+            r.close()
         except Exception as e:
             last_exc = e
             if DEBUG:
                 print("POST exception:", str(e)[:200])
-        _sleep_backoff(attempt)
+            if not is_retryable_error(e):
+                break
+        if attempt + 1 < HTTP_RETRIES:
+            time.sleep(backoff_delay(attempt, retry_after))
     raise RuntimeError(f"POST failed after retries: {last_exc}")
 
-def ncbi_get(url: str, params: Dict, timeout: int = 60) -> requests.Response:
-    for attempt in range(HTTP_RETRIES + 4):
-        r = SESSION.get(url, params=params, timeout=timeout)
+def _ncbi_send(url: str, params: Dict, timeout: int, post: bool, cache: bool) -> requests.Response:
+    if cache and not post:
+        return cached_get(url, params=params, timeout=timeout, limiter=NCBI_LIMITER)
+    NCBI_LIMITER.acquire()
+    if post:
+        # длинные списки id и WebEnv — в теле формы, в URL они не помещаются
+        return SESSION.post(url, data=params, timeout=timeout)
+    return SESSION.get(url, params=params, timeout=timeout)
+
+def ncbi_get(url: str, params: Dict, timeout: int = 60, post: bool = False, cache: bool = True) -> requests.Response:
+    # post и cache=False идут мимо HTTP-кэша: ответы с WebEnv живут на сервере NCBI лишь несколько часов
+    if NCBI_API_KEY and "api_key" not in params:
+        params = {**params, "api_key": NCBI_API_KEY}
+    # 429 у NCBI частый и проходит после паузы — попыток больше, чем у прочих запросов; граница одна на все ветки
+    attempts = HTTP_RETRIES + 4
+    r = None
+    for attempt in range(attempts):
+        try:
+            r = _ncbi_send(url, params, timeout, post, cache)
+        except Exception as e:
+            if not is_retryable_error(e) or attempt + 1 >= attempts:
+                raise
+            if DEBUG:
+                print("NCBI exception:", str(e)[:200])
+            time.sleep(backoff_delay(attempt))
+            continue
         if r.status_code == 429:
             ra = r.headers.get("Retry-After")
             sleep_s = float(ra) if ra and ra.isdigit() else (PUBMED_429_SLEEP * (attempt + 1))
             if DEBUG:
                 print(f"NCBI 429. Sleep {sleep_s:.1f}s and retry...")
-            time.sleep(sleep_s)
+            NCBI_LIMITER.penalize(sleep_s)
+            continue
+        if is_retryable_status(r.status_code) and attempt + 1 < attempts:
+            time.sleep(backoff_delay(attempt, r.headers.get("Retry-After")))
             continue
         r.raise_for_status()
         return r
     r.raise_for_status()
-    return r
\ No newline at end of file
+    return r
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_MB, HTTP_CACHE_TTLS
+from .sqlite_lru import SqliteLruStore
+
+_KEEP_HEADERS = ("content-type", "etag", "last-modified")
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    p = {k: v for k, v in (params or {}).items() if k != "api_key"}
+    raw = url + "?" + json.dumps(p, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class CachedEntry:
+    def __init__(self, key: str, url: str, headers: Dict, body: bytes, encoding: Optional[str], stored_at: float):
+        self.key = key
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.encoding = encoding
+        self.stored_at = stored_at
+
+    def validators(self) -> Dict[str, str]:
+        out = {}
+        if self.headers.get("etag"):
+            out["If-None-Match"] = self.headers["etag"]
+        if self.headers.get("last-modified"):
+            out["If-Modified-Since"] = self.headers["last-modified"]
+        return out
+
+    def response(self) -> requests.Response:
+        r = requests.Response()
+        r.status_code = 200
+        r.url = self.url
+        r._content = self.body
+        r.encoding = self.encoding
+        r.headers = CaseInsensitiveDict(self.headers)
+        return r
+
+class HttpCache:
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, max_mb: float = HTTP_CACHE_MAX_MB, ttls: Optional[Dict[str, float]] = None):
+        self.ttls = ttls if ttls is not None else HTTP_CACHE_TTLS
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        # срок жизни зависит от хоста и проверяется в is_fresh: устаревшая запись нужна ради валидаторов
+        self._store = SqliteLruStore(
+            os.path.join(cache_dir, "http_cache.sqlite"),
+            {"url": "TEXT", "headers": "TEXT", "body": "BLOB", "encoding": "TEXT"},
+            max_bytes=int(max_mb * 1024 * 1024),
+            name="HTTP",
+        )
+
+    def ttl_for(self, url: str) -> float:
+        host = (urlparse(url).netloc or "").lower()
+        return self.ttls.get(host, self.ttls.get("default", 7 * 86400))
+
+    def get(self, url: str, params: Optional[Dict] = None) -> Optional[CachedEntry]:
+        key = cache_key(url, params)
+        row = self._store.get(key)
+        if row is None:
+            return None
+        return CachedEntry(key, row["url"], json.loads(row["headers"]), row["body"], row["encoding"], row["stored_at"])
+
+    def is_fresh(self, entry: CachedEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl_for(entry.url)
+
+    def _count(self, name: str):
+        self._store.count(self, name)
+
+    def lookup(self, url: str, params: Optional[Dict] = None) -> Tuple[Optional[CachedEntry], bool]:
+        # (запись, свежая ли): свежая засчитывается попаданием; устаревшая отдаётся ради валидаторов ревалидации
+        entry = self.get(url, params)
+        fresh = entry is not None and self.is_fresh(entry)
+        if fresh:
+            self._count("hits")
+        return entry, fresh
+
+    def revalidate(self, entry: CachedEntry):
+        # ответ 304: запись снова свежая
+        self._count("revalidated")
+        self.touch(entry)
+
+    def store(self, url: str, params: Optional[Dict], r: requests.Response, keep: bool = True):
+        # промах: ответ получен из сети; keep=False — считаем, но не кладём (пустой или неполный ответ)
+        self._count("misses")
+        if keep:
+            self.put(url, params, r)
+
+    def put(self, url: str, params: Optional[Dict], r: requests.Response):
+        body = r.content or b""
+        headers = {k: r.headers[k] for k in _KEEP_HEADERS if k in r.headers}
+        self._store.put(
+            cache_key(url, params),
+            {"url": r.url or url, "headers": json.dumps(headers), "body": body, "encoding": r.encoding},
+            size=len(body),
+        )
+
+    def touch(self, entry: CachedEntry):
+        entry.stored_at = self._store.touch(entry.key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated}
+
+HTTP_CACHE: Optional[HttpCache] = HttpCache() if HTTP_CACHE_DIR else None
@@ -0,0 +1,128 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from src.synopsis_gen.artifacts import ArtifactStore, ARTIFACTS
+from src.synopsis_gen.config import JOB_WORKERS, JOB_QUEUE_LIMIT, JOB_TTL_SECONDS, DEBUG
+
+class QueueFull(RuntimeError):
+    pass
+
+@dataclass
+class Job:
+    job_id: str
+    status: str = "queued"
+    stage: str = ""
+    stages: Dict[str, str] = field(default_factory=dict)
+    # сколько символов ответа LLM уже пришло по каждому разделу (потоковая генерация)
+    received: Dict[str, int] = field(default_factory=dict)
+    # отчёт pack_evidence по разделам: бюджет, израсходованные токены, сниппеты, дубликаты, не влезшие
+    evidence: Dict[str, Dict] = field(default_factory=dict)
+    # отчёт дедупликации корпуса по слоям (base / extra-...)
+    dedup: Dict[str, Dict] = field(default_factory=dict)
+    # разделы, которые не удалось сгенерировать: в документе они помечены "НУЖНО УТОЧНИТЬ"
+    section_errors: Dict[str, str] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result_path: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": dict(self.stages),
+            "received": dict(self.received),
+            "evidence": dict(self.evidence),
+            "dedup": dict(self.dedup),
+            "section_errors": dict(self.section_errors),
+            "incomplete": bool(self.section_errors),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_QUEUE_LIMIT, ttl: float = JOB_TTL_SECONDS, store: ArtifactStore = ARTIFACTS):
+        self.store = store
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.jobs: Dict[str, Job] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="synopsis-job")
+
+    def submit(self, fn: Callable[..., str], **kwargs) -> Job:
+        with self._lock:
+            self._prune()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"Job queue is full ({self.max_pending} pending)")
+            job = Job(job_id=uuid.uuid4().hex)
+            self.jobs[job.job_id] = job
+            self._pending += 1
+        # срок жизни документа задачи — по одним часам: finished_at + ttl в _prune, а не по mtime файла
+        self.store.pin(job.job_id)
+        self._pool.submit(self._run, job, fn, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+        return self.jobs.get(job_id)
+
+    def _progress(self, job: Job) -> Callable[..., None]:
+        def update(
+            stage: str,
+            state: str,
+            received: Optional[int] = None,
+            evidence: Optional[Dict[str, Dict]] = None,
+            dedup: Optional[Dict[str, Dict]] = None,
+            section_errors: Optional[Dict[str, str]] = None,
+        ):
+            with self._lock:
+                job.stages[stage] = state
+                if state == "running":
+                    job.stage = stage
+                if received is not None:
+                    job.received[stage] = received
+                if evidence is not None:
+                    job.evidence = evidence
+                if dedup is not None:
+                    job.dedup.update(dedup)
+                if section_errors is not None:
+                    job.section_errors.update(section_errors)
+        return update
+
+    def _run(self, job: Job, fn: Callable[..., str], kwargs: Dict):
+        with self._lock:
+            self._pending -= 1
+            job.status = "running"
+            job.started_at = time.time()
+        try:
+            with self.store.write(job.job_id) as tmp_path:
+                fn(out_path=tmp_path, progress=self._progress(job), **kwargs)
+            with self._lock:
+                job.result_path = self.store.path_for(job.job_id)
+                job.status = "done"
+        except Exception as e:
+            if DEBUG:
+                print(f"Job {job.job_id} failed:", str(e)[:500])
+            with self._lock:
+                job.error = str(e)[:500]
+                job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        now = time.time()
+        for jid, job in list(self.jobs.items()):
+            if job.finished_at and now - job.finished_at > self.ttl:
+                self.jobs.pop(jid, None)
+                self.store.remove(jid)
+                self.store.unpin(jid)
@@ -1,8 +1,12 @@
-from typing import Dict
+from typing import Callable, Dict, List, Optional
 import json
 import re
 
 from src.synopsis_gen.llm.yandex_client import LLMClient
+from src.synopsis_gen.llm.response_cache import LLM_CACHE, response_key
+from src.synopsis_gen.config import LLM_STREAM, LLM_JSON_PREFIX_CHARS, LLM_TEMPERATURE, LLM_MAX_TOKENS, DEBUG
+
+_CLOSERS = {"}": "{", "]": "["}
 
 def try_parse_json(txt: str) -> Dict:
     t = (txt or "").strip()
@@ -12,13 +16,103 @@ def try_parse_json(txt: str) -> Dict:
             t = m.group(0)
     return json.loads(t)
 
-def llm_json(llm: LLMClient, system: str, user: str, retries: int = 2) -> Dict:
+class JsonStreamValidator:
+    # проверка структуры по мере прихода текста: ответ без объекта, непарные скобки и перевод строки
+    # внутри строки (json.loads его не примет) видны задолго до конца генерации
+    def __init__(self, prefix_chars: int = LLM_JSON_PREFIX_CHARS):
+        self.prefix_chars = prefix_chars
+        self.pos = 0
+        self.started = False
+        self.closed = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text: str):
+        # text — накопленный ответ; разбираем только новый хвост
+        tail, self.pos = text[self.pos:], len(text)
+        for ch in tail:
+            if self.closed:
+                return
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._stack.append(ch)
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                elif ch == "\n":
+                    raise ValueError("Unescaped newline inside a JSON string")
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in _CLOSERS:
+                if not self._stack or self._stack.pop() != _CLOSERS[ch]:
+                    raise ValueError(f"Unbalanced '{ch}' at char {self.pos - len(tail)}")
+                self.closed = not self._stack
+        if not self.started and self.pos > self.prefix_chars:
+            raise ValueError(f"No JSON object in the first {self.pos} chars")
+
+def _stream_text(llm: LLMClient, system: str, user: str, on_partial: Optional[Callable[[str], None]], temperature: float, max_tokens: int) -> str:
+    validator = JsonStreamValidator()
+    stream = llm.chat_stream(system, user, temperature=temperature, max_tokens=max_tokens)
+    text = ""
+    try:
+        for text in stream:
+            validator.feed(text)
+            if on_partial is not None:
+                on_partial(text)
+            # объект закрыт — остаток генерации (пояснения после JSON) не ждём
+            if validator.closed:
+                break
+    finally:
+        stream.close()
+    return text
+
+def llm_json(
+    llm: LLMClient,
+    system: str,
+    user: str,
+    retries: int = 2,
+    on_partial: Optional[Callable[[str], None]] = None,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+) -> Dict:
+    # ключ — исходный промпт и те же параметры, с которыми идёт вызов модели: ответ, полученный после
+    # повтора с уточнением, тоже находится; use_cache=False — кэш не читается и не пишется
+    key = response_key(llm.model_uri, temperature, max_tokens, system, user) if LLM_CACHE is not None and llm.use_cache else None
+    if key is not None:
+        cached = LLM_CACHE.get(key)
+        if cached is not None:
+            try:
+                data = try_parse_json(cached)
+                if on_partial is not None:
+                    on_partial(cached)
+                return data
+            except ValueError:
+                pass
     last = None
     for _ in range(retries + 1):
-        out = llm.chat(system, user)
         try:
-            return try_parse_json(out)
-        except Exception as e:
+            if LLM_STREAM:
+                out = _stream_text(llm, system, user, on_partial, temperature, max_tokens)
+            else:
+                out = llm.chat(system, user, temperature=temperature, max_tokens=max_tokens)
+            data = try_parse_json(out)
+            if key is not None:
+                LLM_CACHE.put(key, llm.model_uri, out)
+            return data
+        except ValueError as e:
+            # JSONDecodeError — подкласс ValueError; ошибки сети и API пробрасываются как раньше
             last = e
+            if DEBUG:
+                print("LLM JSON rejected:", str(e)[:200])
             user = user + "\n\nВНИМАНИЕ: верни ТОЛЬКО валидный JSON, без markdown и без комментариев."
     raise RuntimeError(f"LLM did not return valid JSON: {last}")
@@ -0,0 +1,39 @@
+import os
+import json
+import hashlib
+from typing import Dict, Optional
+
+from src.synopsis_gen.config import LLM_CACHE_DIR, LLM_CACHE_MAX_MB, LLM_CACHE_TTL_SECONDS
+from src.synopsis_gen.sqlite_lru import SqliteLruStore
+
+def response_key(model_uri: str, temperature: float, max_tokens: int, system: str, user: str) -> str:
+    raw = json.dumps([model_uri, round(float(temperature), 4), int(max_tokens), system, user], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LlmResponseCache:
+    # ответы модели по хэшу (модель, температура, max_tokens, system, user): повтор с теми же evidence не оплачивается заново
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR, max_mb: float = LLM_CACHE_MAX_MB, ttl: float = LLM_CACHE_TTL_SECONDS):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._store = SqliteLruStore(
+            os.path.join(cache_dir, "llm_cache.sqlite"),
+            {"model_uri": "TEXT", "text": "TEXT"},
+            max_bytes=int(max_mb * 1024 * 1024),
+            ttl=ttl,
+            name="LLM",
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._store.get(key)
+        self._store.count(self, "misses" if row is None else "hits")
+        return None if row is None else row["text"]
+
+    def put(self, key: str, model_uri: str, text: str):
+        if self._store.put(key, {"model_uri": model_uri, "text": text}, size=len(text.encode("utf-8"))):
+            self._store.count(self, "stores")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores}
+
+LLM_CACHE: Optional[LlmResponseCache] = LlmResponseCache() if LLM_CACHE_DIR else None
@@ -1,26 +1,56 @@
+import json
+from typing import Dict, Iterator
+
 from src.synopsis_gen.config import YANDEX_MODEL_URI_TEMPLATE, YANDEX_CLOUD_API_KEY, YANDEX_FOLDER_ID, LLM_TEMPERATURE, LLM_MAX_TOKENS, DEBUG
 from src.synopsis_gen.http import safe_post
 
+COMPLETION_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+
+def _alternative_text(data: Dict) -> str:
+    alts = (data.get("result", {}) or {}).get("alternatives", []) or []
+    return ((alts[0].get("message", {}) or {}).get("text", "") or "") if alts else ""
+
 class LLMClient:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
         if not YANDEX_CLOUD_API_KEY or "PASTE_YOUR_API_KEY_HERE" in YANDEX_CLOUD_API_KEY:
             raise RuntimeError("Set YANDEX_CLOUD_API_KEY.")
         if not YANDEX_FOLDER_ID or "PASTE_YOUR_FOLDER_ID_HERE" in YANDEX_FOLDER_ID:
             raise RuntimeError("Set YANDEX_FOLDER_ID.")
+        self.model_uri = YANDEX_MODEL_URI_TEMPLATE.format(folder_id=YANDEX_FOLDER_ID)
+        # use_cache=False: кэш ответов не читается и не пополняется
+        self.use_cache = use_cache
 
-    def chat(self, system: str, user: str, temperature: float = LLM_TEMPERATURE, max_tokens: int = LLM_MAX_TOKENS) -> str:
-        url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+    def _request(self, system: str, user: str, temperature: float, max_tokens: int, stream: bool):
         headers = {"Authorization": f"Api-Key {YANDEX_CLOUD_API_KEY}", "Content-Type": "application/json"}
-        model_uri = YANDEX_MODEL_URI_TEMPLATE.format(folder_id=YANDEX_FOLDER_ID)
         payload = {
-            "modelUri": model_uri,
-            "completionOptions": {"stream": False, "temperature": float(temperature), "maxTokens": int(max_tokens)},
+            "modelUri": self.model_uri,
+            "completionOptions": {"stream": stream, "temperature": float(temperature), "maxTokens": int(max_tokens)},
             "messages": [{"role": "system", "text": system}, {"role": "user", "text": user}],
         }
-        r = safe_post(url, headers=headers, payload=payload, timeout=190)
+        r = safe_post(COMPLETION_URL, headers=headers, payload=payload, timeout=190, stream=stream)
         if DEBUG and r.status_code != 200:
             print("Yandex response:", r.status_code, r.text[:2000])
         r.raise_for_status()
-        data = r.json()
-        alts = (data.get("result", {}) or {}).get("alternatives", []) or []
-        return ((alts[0].get("message", {}) or {}).get("text", "") or "") if alts else ""
\ No newline at end of file
+        return r
+
+    def chat(self, system: str, user: str, temperature: float = LLM_TEMPERATURE, max_tokens: int = LLM_MAX_TOKENS) -> str:
+        r = self._request(system, user, temperature, max_tokens, stream=False)
+        return _alternative_text(r.json())
+
+    def chat_stream(self, system: str, user: str, temperature: float = LLM_TEMPERATURE, max_tokens: int = LLM_MAX_TOKENS) -> Iterator[str]:
+        # отдаёт накопленный текст после каждого сообщения потока; close() генератора рвёт соединение
+        r = self._request(system, user, temperature, max_tokens, stream=True)
+        text = ""
+        try:
+            for line in r.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Yandex stream error: {str(data['error'])[:500]}")
+                part = _alternative_text(data)
+                # сообщения потока несут весь текст с начала ответа; на случай дельт — дописываем
+                text = part if part.startswith(text) else text + part
+                yield text
+        finally:
+            r.close()
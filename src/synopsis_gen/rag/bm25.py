@@ -0,0 +1,146 @@
+import os
+import re
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.synopsis_gen.config import BM25_K1, BM25_B
+
+_TOKEN_RE = re.compile(r"[0-9a-zа-яё∞]+(?:[-/.,][0-9a-zа-яё∞]+)*")
+_SPLIT_RE = re.compile(r"[-/.,]")
+
+def tokenize(text: str) -> List[str]:
+    # составные токены (auc0-∞, lc-ms/ms, 0.5) сохраняем целиком и дополнительно по частям
+    out = []
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        out.append(tok)
+        if _SPLIT_RE.search(tok):
+            out.extend(p for p in _SPLIT_RE.split(tok) if p)
+    return out
+
+class BM25Index:
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.doc_len: List[int] = []
+        # постинги, загруженные с диска (CSR), и дописанные в памяти
+        self._vocab: Dict[str, int] = {}
+        self._indptr: Optional[np.ndarray] = None
+        self._rows: Optional[np.ndarray] = None
+        self._tfs: Optional[np.ndarray] = None
+        self._tail: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, texts: Sequence[str]):
+        for text in texts:
+            row = len(self.doc_len)
+            tf = Counter(tokenize(text))
+            self.doc_len.append(sum(tf.values()))
+            for term, n in tf.items():
+                self._tail[term].append((row, n))
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        rows, tfs = [], []
+        tid = self._vocab.get(term)
+        if tid is not None:
+            a, b = int(self._indptr[tid]), int(self._indptr[tid + 1])
+            rows.append(np.asarray(self._rows[a:b]))
+            tfs.append(np.asarray(self._tfs[a:b]))
+        tail = self._tail.get(term)
+        if tail:
+            rows.append(np.array([r for r, _ in tail], dtype="int64"))
+            tfs.append(np.array([n for _, n in tail], dtype="int64"))
+        if not rows:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="int64")
+        return np.concatenate(rows).astype("int64"), np.concatenate(tfs).astype("float32")
+
+    def terms(self) -> List[str]:
+        return list(dict.fromkeys(list(self._vocab) + list(self._tail)))
+
+    def scores(self, query: str) -> np.ndarray:
+        n = len(self.doc_len)
+        out = np.zeros(n, dtype="float32")
+        if not n:
+            return out
+        dl = np.asarray(self.doc_len, dtype="float32")
+        avgdl = float(dl.mean()) or 1.0
+        for term in set(tokenize(query)):
+            rows, tfs = self.postings(term)
+            if not len(rows):
+                continue
+            idf = math.log(1.0 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = tfs + self.k1 * (1.0 - self.b + self.b * dl[rows] / avgdl)
+            np.add.at(out, rows, idf * tfs * (self.k1 + 1.0) / norm)
+        return out
+
+    def search(self, query: str, k: int, exclude: Optional[set] = None) -> List[Tuple[int, float]]:
+        s = self.scores(query)
+        if exclude:
+            s[list(exclude)] = 0.0
+        cand = np.flatnonzero(s)
+        if not len(cand):
+            return []
+        top = cand[np.argsort(-s[cand], kind="stable")[:k]]
+        return [(int(i), float(s[i])) for i in top]
+
+    @classmethod
+    def combine(cls, parts: Sequence[Tuple["BM25Index", Sequence[int]]]) -> "BM25Index":
+        # склейка слоёв / compact(): оставляем строки keep и перенумеровываем их подряд без повторной токенизации
+        out = cls(parts[0][0].k1, parts[0][0].b) if parts else cls()
+        per_term: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = defaultdict(list)
+        offset = 0
+        for bm, keep in parts:
+            keep = np.asarray(keep, dtype="int64")
+            remap = np.full(len(bm), -1, dtype="int64")
+            remap[keep] = offset + np.arange(len(keep))
+            out.doc_len.extend(np.asarray(bm.doc_len)[keep].tolist())
+            for term in bm.terms():
+                rows, tfs = bm.postings(term)
+                new = remap[rows]
+                mask = new >= 0
+                if mask.any():
+                    per_term[term].append((new[mask], tfs[mask]))
+            offset += len(keep)
+        out._set_csr({t: (np.concatenate([r for r, _ in v]), np.concatenate([n for _, n in v])) for t, v in per_term.items()})
+        return out
+
+    def _set_csr(self, postings: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        vocab = list(postings)
+        indptr = np.zeros(len(vocab) + 1, dtype="int64")
+        indptr[1:] = np.cumsum([len(postings[t][0]) for t in vocab])
+        self._vocab = {t: i for i, t in enumerate(vocab)}
+        self._indptr = indptr
+        self._rows = np.concatenate([postings[t][0] for t in vocab]).astype("int32") if vocab else np.zeros(0, dtype="int32")
+        self._tfs = np.concatenate([postings[t][1] for t in vocab]).astype("int32") if vocab else np.zeros(0, dtype="int32")
+        self._tail = defaultdict(list)
+
+    def save(self, path: str):
+        if self._tail:
+            self._set_csr({t: self.postings(t) for t in self.terms()})
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                vocab=np.array(list(self._vocab), dtype=str),
+                indptr=self._indptr,
+                rows=self._rows,
+                tfs=self._tfs,
+                doc_len=np.asarray(self.doc_len, dtype="int32"),
+                params=np.asarray([self.k1, self.b], dtype="float32"),
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        data = np.load(path)
+        k1, b = data["params"].tolist()
+        bm = cls(k1, b)
+        bm._vocab = {str(t): i for i, t in enumerate(data["vocab"].tolist())}
+        bm._indptr = data["indptr"]
+        bm._rows = data["rows"]
+        bm._tfs = data["tfs"]
+        bm.doc_len = data["doc_len"].tolist()
+        return bm
@@ -1,37 +1,312 @@
 import os
 import re
 import json
-from typing import List, Optional
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
 import fitz
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
-from src.synopsis_gen.rag.mini_rag import MiniRAG, Chunk
-from src.synopsis_gen.config import CACHE_DIR
+from src.synopsis_gen.rag.mini_rag import MiniRAG
+from src.synopsis_gen.rag.encoders import get_encoder, encoder_tag
+from src.synopsis_gen.rag.chunk_store import ChunkStore, write_chunk_store
+from src.synopsis_gen.rag.bm25 import BM25Index
+from src.synopsis_gen.rag.index_factory import tune_index
+from src.synopsis_gen.config import (
+    CACHE_DIR, CACHE_VERSION, EMBED_MODEL_NAME, EMBED_BACKEND, CHUNK_SIZE, CHUNK_OVERLAP,
+    RAG_CACHE_MAX_LAYERS, RAG_EXTRA_TTL_SECONDS, RAG_MEM_CACHE_MB, RAG_INDEX_MMAP,
+    RAG_EVICT_INTERVAL_SECONDS, RAG_EVICT_GRACE_SECONDS, DEBUG,
+)
 
-def rag_cache_path(inn: str) -> str:
+def _fingerprint(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+def embed_fingerprint() -> str:
+    # всё, что меняет векторы или нарезку: при смене любой настройки кэш просто не находится
+    fp = {
+        "version": CACHE_VERSION,
+        "model": EMBED_MODEL_NAME,
+        "backend": EMBED_BACKEND,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    if EMBED_BACKEND == "onnx":
+        # вариант графа (int8/fp32) выбирается при загрузке энкодера по EMBED_ONNX_MAX_DRIFT
+        fp["encoder"] = encoder_tag(get_encoder(EMBED_MODEL_NAME), EMBED_MODEL_NAME)
+    return _fingerprint(fp)
+
+def extras_fingerprint(extra_urls: List[str], local_synopsis_paths: List[str]) -> str:
+    local = []
+    for fp in sorted(set(local_synopsis_paths)):
+        st = os.stat(fp) if os.path.exists(fp) else None
+        local.append([os.path.abspath(fp), st.st_mtime if st else 0, st.st_size if st else 0])
+    return _fingerprint({"urls": sorted(set(extra_urls)), "local": local})
+
+def rag_cache_path(inn: str, layer: str = "base") -> str:
     safe = re.sub(r"[^a-zA-Z0-9_\-]+", "_", inn.strip().lower())
-    return os.path.join(CACHE_DIR, safe)
-
-def save_rag(rag: MiniRAG, cache_dir: str):
-    os.makedirs(cache_dir, exist_ok=True)
-    faiss.write_index(rag.index, os.path.join(cache_dir, "faiss.index"))
-    with open(os.path.join(cache_dir, "chunks.jsonl"), "w", encoding="utf-8") as f:
-        for c in rag.chunks:
-            f.write(json.dumps({"chunk_id": c.chunk_id, "text": c.text, "meta": c.meta}, ensure_ascii=False) + "\n")
-
-def load_rag(cache_dir: str) -> Optional[MiniRAG]:
-    idx_path = os.path.join(cache_dir, "faiss.index")
-    ch_path = os.path.join(cache_dir, "chunks.jsonl")
-    if not (os.path.exists(idx_path) and os.path.exists(ch_path)):
+    return os.path.join(CACHE_DIR, safe, embed_fingerprint(), layer)
+
+# слой пишется целиком в новый подкаталог-поколение, затем атомарно подменяется указатель CURRENT:
+# читатель всегда видит согласованные индекс, чанки и манифест одного поколения
+_LAYER_FILES = ("faiss.index", "manifest.json", "bm25.npz", "vectors.npy", "chunks.bin", "chunks_idx.npy", "chunks_doc.npy", "docs.json")
+
+def layer_dir(cache_dir: str) -> Optional[str]:
+    pointer = os.path.join(cache_dir, "CURRENT")
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            path = os.path.join(cache_dir, f.read().strip())
+        return path if os.path.exists(os.path.join(path, "faiss.index")) else None
+    # слой, записанный до появления поколений: файлы лежат прямо в каталоге
+    return cache_dir if os.path.exists(os.path.join(cache_dir, "faiss.index")) else None
+
+def layer_used_at(cache_dir: str) -> float:
+    # mtime каталога слоя меняется при создании поколения — слой, который сейчас пишется, тоже «свежий»
+    used = os.path.getmtime(cache_dir) if os.path.isdir(cache_dir) else 0.0
+    for name in ("CURRENT", "manifest.json"):
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            return max(used, os.path.getmtime(path))
+    return used
+
+def rag_fingerprint(cache_dir: str) -> Optional[str]:
+    # имя поколения уникально для каждой записи слоя; для слоя, загруженного в память, диск не читаем
+    key = RAG_MEMORY.current(cache_dir)
+    if key is not None:
+        return key
+    path = layer_dir(cache_dir)
+    return os.path.abspath(path) if path else None
+
+class RagMemoryCache:
+    # LRU загруженных MiniRAG в процессе: повторный запрос по тому же МНН не трогает диск
+    def __init__(self, budget_mb: float = RAG_MEM_CACHE_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.used = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        # каталог слоя -> ключ (путь поколения), загруженный в этот процесс: попадание не читает CURRENT
+        self._layers: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def nbytes(rag: MiniRAG) -> int:
+        return int(rag.index.ntotal * rag.index.d * 4) if rag.index is not None else 0
+
+    def get(self, key: Optional[str]) -> Optional[MiniRAG]:
+        if key is None:
+            return None
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def current(self, cache_dir: str) -> Optional[str]:
+        with self._lock:
+            key = self._layers.get(os.path.abspath(cache_dir))
+            return key if key in self._items else None
+
+    def forget(self, cache_dir: str):
+        with self._lock:
+            self._layers.pop(os.path.abspath(cache_dir), None)
+
+    def put(self, key: Optional[str], rag: MiniRAG, cache_dir: Optional[str] = None):
+        size = self.nbytes(rag)
+        if key is None or size > self.budget:
+            return
+        with self._lock:
+            if cache_dir is not None:
+                self._layers[os.path.abspath(cache_dir)] = key
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.used -= old[1]
+            self._items[key] = (rag, size)
+            self.used += size
+            while self.used > self.budget and self._items:
+                _, (_, sz) = self._items.popitem(last=False)
+                self.used -= sz
+
+    def loaded_paths(self) -> List[str]:
+        # ключи — пути поколений слоёв (для объединённых индексов — через "|")
+        with self._lock:
+            return [p for key in self._items for p in key.split("|")]
+
+RAG_MEMORY = RagMemoryCache()
+
+def _read_manifest(path: Optional[str]) -> Dict:
+    if path is None or not os.path.exists(os.path.join(path, "manifest.json")):
+        return {}
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_TOUCHED: Dict[str, float] = {}
+_TOUCH_INTERVAL = 60.0
+
+def touch_rag(cache_dir: str):
+    # метка использования для вытеснения — не чаще раза в минуту, а не на каждый запрос
+    now = time.monotonic()
+    if now - _TOUCHED.get(cache_dir, -_TOUCH_INTERVAL) < _TOUCH_INTERVAL:
+        return
+    _TOUCHED[cache_dir] = now
+    for name in ("CURRENT", "manifest.json"):
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            os.utime(path, None)
+            return
+
+def _prune_generations(cache_dir: str, current: str):
+    # предыдущее поколение оставляем: его могут дочитывать запросы, взявшие старый указатель
+    gens = sorted(n for n in os.listdir(cache_dir) if n.startswith("g") and os.path.isdir(os.path.join(cache_dir, n)))
+    for name in gens[:-2]:
+        if name != current:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    for name in _LAYER_FILES:
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def save_rag(rag: MiniRAG, cache_dir: str, inputs: Optional[Dict] = None):
+    gen = f"g{time.time_ns()}"
+    path = os.path.join(cache_dir, gen)
+    os.makedirs(path)
+    write_chunk_store(rag.chunks, path)
+    rag.bm25.save(os.path.join(path, "bm25.npz"))
+    if rag.vectors is not None:
+        np.save(os.path.join(path, "vectors.npy"), rag.vectors)
+    rag.refreshed_at = time.time()
+    manifest = {
+        "version": CACHE_VERSION,
+        "embed": {"model": EMBED_MODEL_NAME, "backend": EMBED_BACKEND, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+        "inputs": inputs or {},
+        "refreshed_at": rag.refreshed_at,
+        "docs": rag.docs,
+        "deleted": sorted(rag.deleted),
+        "index_report": rag.index_report,
+        "index_ivf": faiss.try_extract_index_ivf(rag.index) is not None,
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    faiss.write_index(rag.index, os.path.join(path, "faiss.index"))
+    pointer = os.path.join(cache_dir, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(gen)
+    os.replace(pointer + ".tmp", pointer)
+    _prune_generations(cache_dir, gen)
+    # записанный экземпляр больше не меняется — следующие запросы берут его из памяти
+    RAG_MEMORY.put(os.path.abspath(path), rag, cache_dir=cache_dir)
+
+def load_rag(cache_dir: str, model: Optional[SentenceTransformer] = None, shared: bool = True) -> Optional[MiniRAG]:
+    # shared=True: экземпляр только для чтения из LRU в памяти (попадание не трогает диск);
+    # для дозаливки нужен shared=False. Свежесть поколения проверяет вызывающий по rag.refreshed_at
+    if shared:
+        cached = RAG_MEMORY.get(RAG_MEMORY.current(cache_dir))
+        if cached is not None:
+            return cached
+    path = layer_dir(cache_dir)
+    if path is None or not os.path.exists(os.path.join(path, "chunks_idx.npy")):
         return None
-    rag = MiniRAG()
-    rag.index = faiss.read_index(idx_path)
-    chunks: List[Chunk] = []
-    with open(ch_path, "r", encoding="utf-8") as f:
-        for line in f:
-            row = json.loads(line)
-            chunks.append(Chunk(chunk_id=row["chunk_id"], text=row["text"], meta=row.get("meta") or {}))
-    rag.chunks = chunks
-    return rag
\ No newline at end of file
+    key = os.path.abspath(path) if shared else None
+    cached = RAG_MEMORY.get(key)
+    if cached is not None:
+        RAG_MEMORY.put(key, cached, cache_dir=cache_dir)
+        return cached
+    rag = MiniRAG(model=model)
+    manifest = _read_manifest(path)
+    # IO_FLAG_MMAP отображает в память только инвертированные списки IVF (их страницы общие у воркеров);
+    # Flat и HNSW всё равно читаются в память процесса целиком, поэтому для них флаг не ставим
+    mmap = shared and RAG_INDEX_MMAP and manifest.get("index_ivf", False)
+    rag.index = tune_index(faiss.read_index(os.path.join(path, "faiss.index"), faiss.IO_FLAG_MMAP if mmap else 0))
+    rag.chunks = ChunkStore(path)
+    rag.dim = rag.index.d
+    rag.docs = manifest.get("docs") or {}
+    rag.deleted = set(manifest.get("deleted") or [])
+    rag.index_report = manifest.get("index_report") or {}
+    rag.refreshed_at = manifest.get("refreshed_at", 0)
+    vec_path = os.path.join(path, "vectors.npy")
+    if os.path.exists(vec_path):
+        rag.vectors = np.load(vec_path, mmap_mode="r")
+    bm25_path = os.path.join(path, "bm25.npz")
+    if os.path.exists(bm25_path):
+        rag.bm25 = BM25Index.load(bm25_path)
+    else:
+        # слой, сохранённый до появления BM25: токенизация дешёвая, векторы не трогаем
+        rag.bm25.add([rag.chunks.text(i) for i in range(len(rag.chunks))])
+    if shared:
+        RAG_MEMORY.put(key, rag, cache_dir=cache_dir)
+    return rag
+
+def evict_rag_cache(
+    root: str = CACHE_DIR,
+    max_layers: int = RAG_CACHE_MAX_LAYERS,
+    extra_ttl: float = RAG_EXTRA_TTL_SECONDS,
+    grace: float = RAG_EVICT_GRACE_SECONDS,
+) -> int:
+    # слой = <inn>/<embed_fp>/<base|extra-...>; время последнего использования — layer_used_at
+    if not os.path.isdir(root):
+        return 0
+    current, now = embed_fingerprint(), time.time()
+    loaded = RAG_MEMORY.loaded_paths()
+    layers, removed = [], 0
+    for inn_dir in os.listdir(root):
+        inn_path = os.path.join(root, inn_dir)
+        # служебные каталоги (например, _embeddings) — не слои индекса
+        if inn_dir.startswith("_") or not os.path.isdir(inn_path):
+            continue
+        for efp in os.listdir(inn_path):
+            efp_path = os.path.join(inn_path, efp)
+            if not os.path.isdir(efp_path):
+                continue
+            if efp != current:
+                shutil.rmtree(efp_path, ignore_errors=True)
+                removed += 1
+                continue
+            for layer in os.listdir(efp_path):
+                path = os.path.join(efp_path, layer)
+                used = layer_used_at(path)
+                # недавно использованный, ещё записываемый или загруженный в память слой не удаляем
+                prefix = os.path.abspath(path) + os.sep
+                if now - used < grace or any(p.startswith(prefix) or p == os.path.abspath(path) for p in loaded):
+                    continue
+                if layer != "base" and now - used > extra_ttl:
+                    shutil.rmtree(path, ignore_errors=True)
+                    removed += 1
+                    continue
+                layers.append((used, path))
+    layers.sort()
+    while len(layers) > max_layers:
+        _, path = layers.pop(0)
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    if DEBUG and removed:
+        print("RAG cache layers evicted:", removed)
+    return removed
+
+_EVICT_LOCK = threading.Lock()
+_EVICT_STATE = {"last": None, "running": False}
+
+def schedule_rag_eviction(interval: float = RAG_EVICT_INTERVAL_SECONDS) -> bool:
+    # обход дерева кэша — в фоновом потоке и не чаще раза в interval, а не на каждый запрос
+    with _EVICT_LOCK:
+        last = _EVICT_STATE["last"]
+        if _EVICT_STATE["running"] or (last is not None and time.monotonic() - last < interval):
+            return False
+        _EVICT_STATE["running"] = True
+
+    def run():
+        try:
+            evict_rag_cache()
+        except Exception as e:
+            if DEBUG:
+                print("RAG cache eviction failed:", str(e)[:200])
+        finally:
+            with _EVICT_LOCK:
+                _EVICT_STATE["running"] = False
+                _EVICT_STATE["last"] = time.monotonic()
+
+    threading.Thread(target=run, name="rag-evict", daemon=True).start()
+    return True
@@ -0,0 +1,98 @@
+import os
+import json
+import mmap
+from typing import Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+
+from src.synopsis_gen.text_utils import short_hash
+from src.synopsis_gen.rag.mini_rag import Chunk
+
+# chunks.bin      — тексты чанков подряд в UTF-8 (читается через mmap)
+# chunks_idx.npy  — int64[n+1] смещения чанков в chunks.bin
+# chunks_doc.npy  — int32[n, 4]: номер документа в docs.json, порядковый номер чанка в документе
+#                   и смещения [start, end) чанка в тексте документа
+# docs.json       — метаданные документов, по одной записи на документ
+
+class ChunkStore(Sequence):
+    def __init__(self, cache_dir: str):
+        self._offsets = np.load(os.path.join(cache_dir, "chunks_idx.npy"), mmap_mode="r")
+        self._docs = np.load(os.path.join(cache_dir, "chunks_doc.npy"), mmap_mode="r")
+        with open(os.path.join(cache_dir, "docs.json"), "r", encoding="utf-8") as f:
+            self._metas: List[Dict] = json.load(f)
+        blob_path = os.path.join(cache_dir, "chunks.bin")
+        self._blob = None
+        if os.path.getsize(blob_path):
+            with open(blob_path, "rb") as f:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._n = len(self._offsets) - 1
+        # чанки, дописанные после загрузки (инкрементальное обновление), держим в памяти
+        self._tail: List = []
+
+    def __len__(self) -> int:
+        return self._n + len(self._tail)
+
+    def text(self, i: int) -> str:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._blob[start:end].decode("utf-8") if self._blob is not None else ""
+
+    def meta(self, i: int) -> Dict:
+        if i >= self._n:
+            return self._tail[i - self._n].meta or {}
+        return self._metas[int(self._docs[i][0])]
+
+    def _get(self, i: int):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i >= self._n:
+            return self._tail[i - self._n]
+        text = self.text(i)
+        m = self.meta(i)
+        cid = f"{m.get('source','src')}-{m.get('id','')}-{int(self._docs[i][1])}-{short_hash(text)}"
+        start, end = (int(self._docs[i][2]), int(self._docs[i][3])) if self._docs.shape[1] >= 4 else (0, 0)
+        return Chunk(chunk_id=cid, text=text, meta=m, start=start, end=end)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self._get(j) for j in range(*i.indices(len(self)))]
+        return self._get(i)
+
+    def __iter__(self) -> Iterator:
+        for i in range(len(self)):
+            yield self._get(i)
+
+    def extend(self, chunks):
+        self._tail.extend(chunks)
+
+def write_chunk_store(chunks: Sequence, cache_dir: str):
+    doc_ids: Dict[str, int] = {}
+    metas: List[Dict] = []
+    offsets = [0]
+    docs = []
+    last_doc, ordinal = None, 0
+    tmp = {name: os.path.join(cache_dir, name + ".tmp") for name in ("chunks.bin", "chunks_idx.npy", "chunks_doc.npy", "docs.json")}
+    with open(tmp["chunks.bin"], "wb") as blob:
+        for c in chunks:
+            m = c.meta or {}
+            mkey = json.dumps(m, sort_keys=True, ensure_ascii=False)
+            did = doc_ids.get(mkey)
+            if did is None:
+                did = doc_ids[mkey] = len(metas)
+                metas.append(m)
+            ordinal = ordinal + 1 if did == last_doc else 0
+            last_doc = did
+            data = c.text.encode("utf-8")
+            blob.write(data)
+            offsets.append(offsets[-1] + len(data))
+            docs.append((did, ordinal, c.start, c.end))
+    with open(tmp["chunks_idx.npy"], "wb") as f:
+        np.save(f, np.asarray(offsets, dtype="int64"))
+    with open(tmp["chunks_doc.npy"], "wb") as f:
+        np.save(f, np.asarray(docs, dtype="int32").reshape(-1, 4))
+    with open(tmp["docs.json"], "w", encoding="utf-8") as f:
+        json.dump(metas, f, ensure_ascii=False)
+    # каждый файл подменяется атомарно: уже загруженные ChunkStore дочитывают старые версии через mmap
+    for name, path in tmp.items():
+        os.replace(path, os.path.join(cache_dir, name))
@@ -0,0 +1,121 @@
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.synopsis_gen.config import DEDUP_NEAR_THRESHOLD, DEDUP_NUM_PERM, DEDUP_BANDS, DEBUG
+
+_WORD_RE = re.compile(r"\w+")
+_PMID_URL_RE = re.compile(r"pubmed\.ncbi\.nlm\.nih\.gov/(\d+)|europepmc\.org/(?:abstract|article)/med/(\d+)", re.I)
+_PMCID_RE = re.compile(r"\bPMC\d+\b", re.I)
+_SHINGLE = 3
+
+def article_ids(d: Dict) -> List[str]:
+    # PMID/PMCID из полей записи и из URL: PubMed-аннотация, запись EuropePMC и полный текст PMC сходятся в один ключ
+    ids = []
+    pmid = str(d.get("pmid") or (d.get("id") if d.get("source") == "PubMed" else "") or "").strip()
+    if pmid:
+        ids.append("pmid:" + pmid)
+    pmcid = str(d.get("pmcid") or "").strip().upper()
+    if pmcid:
+        ids.append("pmcid:" + pmcid)
+    url = d.get("url") or ""
+    for m in _PMID_URL_RE.finditer(url):
+        ids.append("pmid:" + (m.group(1) or m.group(2)))
+    for m in _PMCID_RE.finditer(url):
+        ids.append("pmcid:" + m.group(0).upper())
+    return list(dict.fromkeys(ids))
+
+class MinHasher:
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = max(1, min(bands, num_perm))
+        self.rows = num_perm // self.bands
+        # multiply-shift хэши: (a*x + b) mod 2^64, старшие 32 бита
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        words = _WORD_RE.findall((text or "").lower())
+        if len(words) < _SHINGLE * 2:
+            return None
+        sh = np.fromiter(
+            {zlib.crc32(" ".join(words[i:i + _SHINGLE]).encode("utf-8")) for i in range(len(words) - _SHINGLE + 1)},
+            dtype=np.uint64,
+        )
+        with np.errstate(over="ignore"):
+            h = (sh[:, None] * self._a[None, :] + self._b[None, :]) >> np.uint64(32)
+        return h.min(axis=0)
+
+    def band_keys(self, sig: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(b, sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+def _union(parent: List[int], i: int, j: int):
+    ri, rj = _find(parent, i), _find(parent, j)
+    if ri != rj:
+        parent[max(ri, rj)] = min(ri, rj)
+
+def dedupe_near_duplicates(docs: List[Dict], threshold: float = DEDUP_NEAR_THRESHOLD) -> Tuple[List[Dict], Dict]:
+    n = len(docs)
+    parent = list(range(n))
+    by_id: Dict[str, int] = {}
+    id_links = 0
+    for i, d in enumerate(docs):
+        for key in article_ids(d):
+            j = by_id.setdefault(key, i)
+            if j != i and _find(parent, i) != _find(parent, j):
+                _union(parent, i, j)
+                id_links += 1
+
+    # MinHash + LSH по полосам: кандидаты — совпавшие хотя бы в одной полосе, проверяем оценку Жаккара
+    hasher = MinHasher()
+    sigs = [hasher.signature(d.get("text") or "") for d in docs]
+    buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+    near_links = 0
+    for i, sig in enumerate(sigs):
+        if sig is None:
+            continue
+        cands = set()
+        for key in hasher.band_keys(sig):
+            cands.update(buckets[key])
+            buckets[key].append(i)
+        for j in cands:
+            if _find(parent, i) != _find(parent, j) and float(np.mean(sigs[j] == sig)) >= threshold:
+                _union(parent, i, j)
+                near_links += 1
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(n):
+        groups[_find(parent, i)].append(i)
+    kept = []
+    for root in sorted(groups):
+        members = groups[root]
+        # оставляем самую полную версию (обычно полный текст PMC), эталонный синопсис — всегда;
+        # недостающие идентификаторы и библиографические поля (журнал, дата, MeSH из PubMed) берём у дублей
+        best = max(members, key=lambda i: (docs[i].get("source") == "SYNOPSIS_DOCX", len(docs[i].get("text") or ""), -i))
+        doc = dict(docs[best])
+        for i in members:
+            for k in ("pmid", "pmcid", "year", "journal", "pub_date", "mesh"):
+                if not doc.get(k) and docs[i].get(k):
+                    doc[k] = docs[i][k]
+        kept.append(doc)
+    report = {
+        "input": n,
+        "kept": len(kept),
+        "removed": n - len(kept),
+        "id_matches": id_links,
+        "near_duplicates": near_links,
+        "chars_removed": sum(len(d.get("text") or "") for d in docs) - sum(len(d.get("text") or "") for d in kept),
+    }
+    if DEBUG:
+        print("Near-duplicate dedup:", report)
+    return kept, report
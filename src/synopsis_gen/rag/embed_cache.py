@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: только блокировка внутри процесса
+    fcntl = None
+
+from src.synopsis_gen.config import EMBED_CACHE_DIR, EMBED_CACHE_MAX_MB, DEBUG
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    # vectors*.f32 — плоская float32-матрица (строки дописываются в конец), keys.txt — sha1 текста на строку.
+    # первая строка keys.txt: "dim=<d>" и, после вытеснения, "vec=<файл векторов>" — пара меняется атомарно
+    def __init__(self, model_name: str, root: str = EMBED_CACHE_DIR, max_mb: float = EMBED_CACHE_MAX_MB):
+        self.dir = os.path.join(root, re.sub(r"[^a-zA-Z0-9_\-]+", "_", model_name))
+        self.vec_path = os.path.join(self.dir, "vectors.f32")
+        self.key_path = os.path.join(self.dir, "keys.txt")
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.dim: Optional[int] = None
+        self.rows: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        # ключи, прочитанные или записанные этим процессом: при вытеснении сохраняются в первую очередь
+        self._used: set = set()
+        self._mm: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.key_path):
+            return
+        with open(self.key_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        if not lines or not lines[0].startswith("dim="):
+            return
+        header = dict(part.split("=", 1) for part in lines[0].split() if "=" in part)
+        vec_path = os.path.join(self.dir, header.get("vec", "vectors.f32"))
+        if not os.path.exists(vec_path):
+            return
+        self.dim = int(header["dim"])
+        self.vec_path = vec_path
+        # строка ключа пишется после вектора, поэтому оборванная запись отсекается по min()
+        n = min(len(lines) - 1, os.path.getsize(self.vec_path) // (4 * self.dim))
+        self.rows = {k: i for i, k in enumerate(lines[1:n + 1])}
+
+    def _matrix(self) -> np.memmap:
+        if self._mm is None or self._mm.shape[0] < len(self.rows):
+            self._mm = np.memmap(self.vec_path, dtype="float32", mode="r", shape=(len(self.rows), self.dim))
+        return self._mm
+
+    def get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            hit = [k for k in keys if k in self.rows]
+            if not hit:
+                return {}
+            try:
+                mm = self._matrix()
+            except FileNotFoundError:
+                # другой воркер вытеснил часть строк и заменил файл векторов — перечитываем
+                self.rows, self._mm = {}, None
+                self._load()
+                hit = [k for k in keys if k in self.rows]
+                if not hit:
+                    return {}
+                mm = self._matrix()
+            self._used.update(hit)
+            return {k: np.array(mm[self.rows[k]]) for k in hit}
+
+    def put(self, keys: List[str], emb: np.ndarray):
+        emb = np.ascontiguousarray(emb, dtype="float32")
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(os.path.join(self.dir, ".lock"), "w") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                # другие воркеры могли дописать строки — перечитываем ключи под блокировкой
+                self._load()
+                self._mm = None
+                if self.dim is None:
+                    self.dim = emb.shape[1]
+                    with open(self.key_path, "w", encoding="utf-8") as f:
+                        f.write(f"dim={self.dim}\n")
+                    open(self.vec_path, "wb").close()
+                new = [(k, v) for k, v in zip(keys, emb) if k not in self.rows]
+                if not new:
+                    return
+                # отрезаем вектор без ключа, оставшийся от оборванной записи, чтобы строки не съехали
+                with open(self.vec_path, "r+b") as f:
+                    f.truncate(len(self.rows) * 4 * self.dim)
+                with open(self.vec_path, "ab") as f:
+                    f.write(np.stack([v for _, v in new]).tobytes())
+                with open(self.key_path, "a", encoding="utf-8") as f:
+                    f.write("".join(k + "\n" for k, _ in new))
+                for k, _ in new:
+                    self.rows[k] = len(self.rows)
+                self._used.update(k for k, _ in new)
+                self._evict()
+
+    def _evict(self):
+        # превысили EMBED_CACHE_MAX_MB — переписываем до 3/4 лимита: сначала строки, нужные этому процессу,
+        # затем самые свежие; вызывается под файловой блокировкой
+        max_rows = self.max_bytes // (4 * self.dim)
+        if len(self.rows) <= max_rows:
+            return
+        order = sorted(self.rows, key=self.rows.get)
+        keep = ([k for k in order if k not in self._used] + [k for k in order if k in self._used])[-int(max_rows * 0.75):]
+        old = np.memmap(self.vec_path, dtype="float32", mode="r", shape=(len(self.rows), self.dim))
+        name = f"vectors.{time.time_ns()}.f32"
+        np.asarray(old[[self.rows[k] for k in keep]]).tofile(os.path.join(self.dir, name))
+        del old
+        with open(self.key_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(f"dim={self.dim} vec={name}\n" + "".join(k + "\n" for k in keep))
+        os.replace(self.key_path + ".tmp", self.key_path)
+        # уже открытые memmap других процессов дочитывают старый файл
+        try:
+            os.remove(self.vec_path)
+        except OSError:
+            pass
+        if DEBUG:
+            print(f"Embedding cache evicted {len(self.rows) - len(keep)} rows")
+        self.rows, self._mm = {}, None
+        self._load()
+        self._used &= set(self.rows)
+
+    def encode(self, model, texts: List[str], **kwargs) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+        cached = self.get(keys)
+        miss = list(dict.fromkeys(k for k in keys if k not in cached))
+        with self._lock:
+            self.hits += len(cached)
+            self.misses += len(miss)
+        if miss:
+            by_key = dict(zip(keys, texts))
+            emb = np.asarray(model.encode([by_key[k] for k in miss], **kwargs), dtype="float32")
+            self.put(miss, emb)
+            cached.update(zip(miss, emb))
+        if DEBUG:
+            print(f"Embedding cache: {len(texts)} texts, {len(miss)} encoded")
+        return np.stack([cached[k] for k in keys]) if keys else np.zeros((0, self.dim or 0), dtype="float32")
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+def get_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    if not EMBED_CACHE_DIR:
+        return None
+    with _CACHES_LOCK:
+        cache = _CACHES.get(model_name)
+        if cache is None:
+            cache = EmbeddingCache(model_name)
+            _CACHES[model_name] = cache
+        return cache
@@ -0,0 +1,56 @@
+import threading
+from typing import Dict, Set, Union
+
+from sentence_transformers import SentenceTransformer
+
+from src.synopsis_gen.rag.onnx_encoder import OnnxEncoder, load_onnx_encoder
+from src.synopsis_gen.config import EMBED_MODEL_NAME, EMBED_BACKEND, EMBED_THREADS, DEBUG
+
+Encoder = Union[SentenceTransformer, OnnxEncoder]
+
+_ENCODERS: Dict[str, Encoder] = {}
+# модели, на которых уже прошёл пробный encode: загружена ≠ готова (экспорт ONNX, ленивая инициализация)
+_WARMED: Set[str] = set()
+_LOCK = threading.Lock()
+
+def _load(model_name: str) -> Encoder:
+    if EMBED_BACKEND == "onnx":
+        try:
+            return load_onnx_encoder(model_name)
+        except ImportError as e:
+            raise RuntimeError(f"EMBED_BACKEND=onnx requires onnxruntime: {e}")
+    if EMBED_THREADS > 0:
+        import torch
+        torch.set_num_threads(EMBED_THREADS)
+    return SentenceTransformer(model_name)
+
+def get_encoder(model_name: str = EMBED_MODEL_NAME) -> Encoder:
+    model = _ENCODERS.get(model_name)
+    if model is not None:
+        return model
+    with _LOCK:
+        model = _ENCODERS.get(model_name)
+        if model is None:
+            if DEBUG:
+                print("Loading embedding model:", model_name, f"({EMBED_BACKEND})")
+            model = _load(model_name)
+            _ENCODERS[model_name] = model
+    return model
+
+def encoder_tag(model: Encoder, model_name: str) -> str:
+    # кэш эмбеддингов раздельный для PyTorch и ONNX-вариантов: векторы у них немного различаются
+    if isinstance(model, OnnxEncoder):
+        return f"{model_name}@onnx-{model.variant}"
+    return model_name
+
+def is_encoder_loaded(model_name: str = EMBED_MODEL_NAME) -> bool:
+    return model_name in _ENCODERS
+
+def is_encoder_warm(model_name: str = EMBED_MODEL_NAME) -> bool:
+    return model_name in _WARMED
+
+def warm_up(model_name: str = EMBED_MODEL_NAME) -> Encoder:
+    model = get_encoder(model_name)
+    model.encode(["warm up"], normalize_embeddings=True)
+    _WARMED.add(model_name)
+    return model
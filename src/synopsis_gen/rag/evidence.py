@@ -0,0 +1,128 @@
+import re
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.synopsis_gen.rag.mini_rag import Chunk, MiniRAG
+from src.synopsis_gen.config import (
+    TOP_K, EVIDENCE_DEDUPE_ACROSS, EVIDENCE_TOKEN_BUDGET, EVIDENCE_SECTION_BUDGETS, EVIDENCE_MAX_PER_DOC,
+    EVIDENCE_DUP_THRESHOLD, EVIDENCE_PRIORITY_WEIGHT, DEBUG,
+)
+
+EMPTY_EVIDENCE = "НЕТ ДОКАЗАТЕЛЬСТВ"
+SEPARATOR = "\n---\n"
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+_SHINGLE_RE = re.compile(r"\w+")
+
+def source_priority(m: Dict) -> int:
+    url = (m.get("url") or "").lower()
+    src = (m.get("source") or "")
+    s = 0
+    if src == "SYNOPSIS_DOCX":
+        s += 100
+    if url.endswith(".pdf"):
+        s += 40
+    if "ema.europa.eu" in url:
+        s += 35
+    if "pmc.ncbi.nlm.nih.gov" in url:
+        s += 25
+    if "pubmed.ncbi.nlm.nih.gov" in url:
+        s += 15
+    return s
+
+def estimate_tokens(text: str) -> int:
+    # без токенизатора модели: слово ~ 1 токен на каждые 4 символа, знак препинания — 1 токен
+    return sum(max(1, math.ceil(len(w) / 4)) if w[0].isalnum() or w[0] == "_" else 1 for w in _WORD_RE.findall(text or ""))
+
+def _doc_of(m: Dict) -> Tuple:
+    return (m.get("source", ""), m.get("id", ""), m.get("url", ""))
+
+def _label(m: Dict) -> str:
+    sid = m.get("id") or m.get("pmid") or m.get("pmcid") or ""
+    label = f"[{m.get('source','SRC')}|{sid}|{m.get('year','')}] {m.get('url','')}"
+    return f"{label} — {m['section']}" if m.get("section") else label
+
+def _shingles(text: str, n: int = 5) -> Set[int]:
+    words = _SHINGLE_RE.findall(text.lower())
+    return {hash(tuple(words[i:i + n])) for i in range(max(1, len(words) - n + 1))}
+
+def _trim_overlap(prev: str, text: str, min_chars: int = 40) -> str:
+    # соседние чанки одного документа пересекаются на CHUNK_OVERLAP символов — общий кусок не повторяем
+    if len(text) < min_chars or len(prev) < min_chars:
+        return text
+    pos = prev.rfind(text[:min_chars])
+    if pos >= 0 and text.startswith(prev[pos:]):
+        return text[len(prev) - pos:]
+    pos = text.rfind(prev[:min_chars])
+    if pos >= 0 and prev.startswith(text[pos:]):
+        return text[:pos]
+    return text
+
+def pack_evidence(hits: List[Tuple[Chunk, float]], budget: int = EVIDENCE_TOKEN_BUDGET, seen: Optional[Set] = None) -> Tuple[str, Dict]:
+    # seen — документы, уже процитированные в других разделах (dedupe_across)
+    seen = seen if seen is not None else set()
+    report = {"budget": budget, "tokens": 0, "snippets": 0, "candidates": len(hits), "duplicates": 0, "over_budget": 0}
+    if not hits:
+        return EMPTY_EVIDENCE, report
+    scores = [s for _, s in hits]
+    lo, hi = min(scores), max(scores)
+    def rank_key(item: Tuple[Chunk, float]) -> float:
+        c, s = item
+        rel = (s - lo) / (hi - lo) if hi > lo else 1.0
+        return rel + EVIDENCE_PRIORITY_WEIGHT * min(source_priority(c.meta or {}), 100) / 100
+    packed: List[Tuple[Dict, str, Set[int]]] = []
+    per_doc: Dict[Tuple, int] = {}
+    cited: Set = set()
+    sep_tokens = estimate_tokens(SEPARATOR)
+    for c, _ in sorted(hits, key=rank_key, reverse=True):
+        m = c.meta or {}
+        doc = _doc_of(m)
+        if doc in seen or per_doc.get(doc, 0) >= EVIDENCE_MAX_PER_DOC:
+            report["duplicates"] += 1
+            continue
+        text = c.text
+        for pm, ptext, _ in packed:
+            if _doc_of(pm) == doc:
+                text = _trim_overlap(ptext, text)
+        sh = _shingles(text)
+        if not text.strip() or any(len(sh & psh) >= EVIDENCE_DUP_THRESHOLD * min(len(sh), len(psh)) for _, _, psh in packed):
+            report["duplicates"] += 1
+            continue
+        cost = estimate_tokens(f"{_label(m)}\nSNIPPET: {text}\n") + (sep_tokens if packed else 0)
+        if report["tokens"] + cost > budget:
+            report["over_budget"] += 1
+            continue
+        report["tokens"] += cost
+        per_doc[doc] = per_doc.get(doc, 0) + 1
+        cited.add(doc)
+        packed.append((m, text, sh))
+    seen.update(cited)
+    report["snippets"] = len(packed)
+    if not packed:
+        return EMPTY_EVIDENCE, report
+    return SEPARATOR.join(f"{_label(m)}\nSNIPPET: {text}\n" for m, text, _ in packed), report
+
+def evidence_block(rag: MiniRAG, query: str, top_k: int = TOP_K, budget: int = EVIDENCE_TOKEN_BUDGET) -> str:
+    return pack_evidence(rag.search_many_scored([query], top_k=top_k)[0], budget)[0]
+
+def evidence_blocks(
+    rag: MiniRAG,
+    queries: Dict[str, str],
+    top_k: int = TOP_K,
+    dedupe_across: bool = EVIDENCE_DEDUPE_ACROSS,
+    budgets: Optional[Dict[str, int]] = None,
+    report: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, str]:
+    keys = list(queries)
+    budgets = EVIDENCE_SECTION_BUDGETS if budgets is None else budgets
+    results = rag.search_many_scored([queries[k] for k in keys], top_k=top_k)
+    # dedupe_across: документ, уже процитированный в одном разделе, не повторяется в следующих
+    shared: Set = set()
+    out = {}
+    for k, hits in zip(keys, results):
+        out[k], stats = pack_evidence(hits, budgets.get(k, EVIDENCE_TOKEN_BUDGET), shared if dedupe_across else None)
+        if report is not None:
+            report[k] = stats
+        if DEBUG:
+            print(f"Evidence {k}: {stats['tokens']}/{stats['budget']} tokens, {stats['snippets']} snippets")
+    return out
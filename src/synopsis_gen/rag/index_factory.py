@@ -0,0 +1,108 @@
+import math
+import time
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+from src.synopsis_gen.config import (
+    RAG_INDEX_TYPE, RAG_INDEX_HNSW_MIN, RAG_INDEX_IVF_MIN, RAG_INDEX_PQ_MIN,
+    RAG_INDEX_TRAIN_SAMPLE, RAG_INDEX_NPROBE, RAG_INDEX_EF_SEARCH, DEBUG,
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+def choose_index_type(n: int) -> str:
+    if RAG_INDEX_TYPE in INDEX_TYPES:
+        return RAG_INDEX_TYPE
+    if n >= RAG_INDEX_PQ_MIN:
+        return "ivf_pq"
+    if n >= RAG_INDEX_IVF_MIN:
+        return "ivf_flat"
+    if n >= RAG_INDEX_HNSW_MIN:
+        return "hnsw"
+    return "flat"
+
+def _factory_string(kind: str, n: int, d: int) -> str:
+    if kind == "hnsw":
+        return "HNSW32"
+    # ~4*sqrt(n) списков, но не меньше 39 обучающих векторов на список (рекомендация FAISS)
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+    if kind == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if kind == "ivf_pq":
+        m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if d % m == 0)
+        return f"IVF{nlist},PQ{m}"
+    return "Flat"
+
+def tune_index(index: faiss.Index) -> faiss.Index:
+    # вызывается при создании и загрузке индекса — до того, как его увидят другие потоки
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(RAG_INDEX_NPROBE, ivf.nlist)
+        # прямая карта нужна reconstruct_n; строим здесь, а не при чтении векторов: общий (в т.ч. mmap) индекс
+        # после загрузки не меняем. Карта сохраняется вместе с индексом, повторный вызов ничего не делает
+        ivf.make_direct_map()
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = RAG_INDEX_EF_SEARCH
+    return index
+
+def build_index(emb: np.ndarray, kind: Optional[str] = None) -> faiss.Index:
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    n, d = emb.shape
+    kind = kind or choose_index_type(n)
+    # IVF/PQ нечему обучаться на крошечном корпусе
+    if kind == "ivf_pq" and n < 256 * 39:
+        kind = "ivf_flat"
+    if kind == "ivf_flat" and n < 39 * 8:
+        kind = "flat"
+    index = faiss.index_factory(d, _factory_string(kind, n, d), faiss.METRIC_INNER_PRODUCT)
+    if not index.is_trained:
+        rng = np.random.default_rng(0)
+        sample = emb[rng.choice(n, size=min(n, RAG_INDEX_TRAIN_SAMPLE), replace=False)]
+        index.train(sample)
+    index.add(emb)
+    return tune_index(index)
+
+def is_lossy(index: faiss.Index) -> bool:
+    # PQ хранит только коды: reconstruct_n возвращает приближение, переобучаться на нём нельзя
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return ivf.code_size < 4 * ivf.d
+    return isinstance(index, faiss.IndexPQ)
+
+def index_vectors(index: faiss.Index) -> np.ndarray:
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype="float32")
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.no():
+        # индекс пришёл мимо tune_index — карту строим в собственной копии, чужой индекс не трогаем
+        index = faiss.clone_index(index)
+        faiss.try_extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def evaluate_index(index: faiss.Index, emb: np.ndarray, k: int = 10, n_queries: int = 200) -> Dict:
+    # recall@k и задержка относительно точного перебора; запросы — случайные векторы самого корпуса
+    emb = np.ascontiguousarray(emb, dtype="float32")
+    rng = np.random.default_rng(1)
+    q = emb[rng.choice(len(emb), size=min(len(emb), n_queries), replace=False)]
+    k = min(k, len(emb))
+    flat = faiss.IndexFlatIP(emb.shape[1])
+    flat.add(emb)
+    t0 = time.perf_counter()
+    _, truth = flat.search(q, k)
+    t_flat = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    _, got = index.search(q, k)
+    t_index = time.perf_counter() - t0
+    recall = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(truth.tolist(), got.tolist())])) if k else 1.0
+    report = {
+        "type": type(index).__name__,
+        "ntotal": int(index.ntotal),
+        f"recall@{k}": round(recall, 4),
+        "flat_ms_per_query": round(1000 * t_flat / max(1, len(q)), 4),
+        "index_ms_per_query": round(1000 * t_index / max(1, len(q)), 4),
+    }
+    if DEBUG:
+        print("Index report:", report)
+    return report
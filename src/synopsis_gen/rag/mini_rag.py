@@ -1,5 +1,7 @@
+import hashlib
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence, Set, Tuple
 from tqdm import tqdm
 
 import fitz
@@ -7,61 +9,259 @@ import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
-from src.synopsis_gen.text_utils import short_hash, chunk_text
-from src.synopsis_gen.config import EMBED_MODEL_NAME, TOP_K
+from src.synopsis_gen.text_utils import short_hash, iter_chunks
+from src.synopsis_gen.rag.encoders import get_encoder, encoder_tag
+from src.synopsis_gen.rag.embed_cache import get_embedding_cache
+from src.synopsis_gen.rag.index_factory import build_index, index_vectors, evaluate_index, is_lossy
+from src.synopsis_gen.rag.bm25 import BM25Index
+from src.synopsis_gen.config import (
+    EMBED_MODEL_NAME, EMBED_BATCH_SIZE, TOP_K, RAG_COMPACT_RATIO,
+    RETRIEVAL_MODE, RRF_K, RRF_CANDIDATES,
+)
 
 @dataclass
 class Chunk:
     chunk_id: str
     text: str
     meta: Dict
+    # смещения [start, end) в тексте документа
+    start: int = 0
+    end: int = 0
+
+class ChunkView(Sequence):
+    # склейка чанков нескольких слоёв без копирования/декодирования: (последовательность, номера строк)
+    def __init__(self, parts: List[Tuple[Sequence, List[int]]]):
+        self._parts = parts
+        self._tail: List[Chunk] = []
+        self._n = sum(len(rows) for _, rows in parts)
+
+    def __len__(self) -> int:
+        return self._n + len(self._tail)
+
+    def _locate(self, i: int) -> Tuple[Sequence, int]:
+        for seq, rows in self._parts:
+            if i < len(rows):
+                return seq, rows[i]
+            i -= len(rows)
+        raise IndexError(i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i >= self._n:
+            return self._tail[i - self._n]
+        seq, row = self._locate(i)
+        return seq[row]
+
+    def meta(self, i: int) -> Dict:
+        if i >= self._n:
+            return self._tail[i - self._n].meta or {}
+        seq, row = self._locate(i)
+        return seq.meta(row) if hasattr(seq, "meta") else (seq[row].meta or {})
+
+    def extend(self, chunks):
+        self._tail.extend(chunks)
+
+def doc_key(d: Dict) -> str:
+    return f"{d.get('source','')}|{d.get('id','')}|{d.get('url','')}"
+
+def doc_hash(d: Dict) -> str:
+    return hashlib.sha1((d.get("text") or "").encode("utf-8")).hexdigest()
 
 class MiniRAG:
-    def __init__(self, embed_model_name: str = EMBED_MODEL_NAME):
-        self.model = SentenceTransformer(embed_model_name)
+    def __init__(self, embed_model_name: str = EMBED_MODEL_NAME, model: Optional[SentenceTransformer] = None):
+        self.model = model if model is not None else get_encoder(embed_model_name)
+        self.embed_model_name = embed_model_name
         self.index = None
         self.chunks: List[Chunk] = []
         self.dim = None
+        # манифест документов: ключ -> хэш текста и диапазон строк индекса [start, end)
+        self.docs: Dict[str, Dict] = {}
+        self.deleted: Set[int] = set()
+        self.index_report: Dict = {}
+        # исходные float-векторы строк индекса — только для индексов с потерями (IVF-PQ),
+        # у остальных точные векторы восстанавливаются из самого индекса
+        self.vectors: Optional[np.ndarray] = None
+        # лексический индекс по тем же строкам, что и FAISS
+        self.bm25 = BM25Index()
+        # время последнего обновления корпуса слоя (из манифеста кэша) — срок проверяется без чтения диска
+        self.refreshed_at = 0.0
 
     def add_documents(self, docs: List[Dict]):
         new_chunks: List[Chunk] = []
+        spans: List[Tuple[Dict, int, int]] = []
         for d in docs:
             text = d.get("text", "")
             if not text:
                 continue
-            for i, ch in enumerate(chunk_text(text)):
-                cid = f"{d.get('source','src')}-{d.get('id','')}-{i}-{short_hash(ch)}"
-                meta = {k: d.get(k) for k in ["source", "id", "title", "year", "url", "pmid", "pmcid"] if d.get(k) is not None}
-                new_chunks.append(Chunk(chunk_id=cid, text=ch, meta=meta))
+            # повторы внутри документа (колонтитулы, шаблонный текст страницы) пропускаем; между документами
+            # строки не делим — иначе удаление одного документа снесёт общую строку у другого. Одинаковые
+            # тексты разных документов всё равно кодируются один раз (см. _encode)
+            seen_text: Set[str] = set()
+            start = len(self.chunks) + len(new_chunks)
+            meta = {k: d.get(k) for k in ["source", "id", "title", "year", "url", "pmid", "pmcid", "journal", "pub_date", "mesh"] if d.get(k) is not None}
+            # полные тексты из JATS: [(смещение, заголовок раздела)] — раздел чанка кладём в его метаданные
+            sections = d.get("sections") or []
+            starts = [int(sp[0]) for sp in sections]
+            for i, (s, e, ch) in enumerate(iter_chunks(text)):
+                h = short_hash(ch)
+                if h in seen_text:
+                    continue
+                seen_text.add(h)
+                cid = f"{d.get('source','src')}-{d.get('id','')}-{i}-{h}"
+                m = meta
+                if sections:
+                    title = sections[max(0, bisect_right(starts, s) - 1)][1]
+                    m = {**meta, "section": title} if title else meta
+                new_chunks.append(Chunk(chunk_id=cid, text=ch, meta=m, start=s, end=e))
+            spans.append((d, start, len(self.chunks) + len(new_chunks)))
         if not new_chunks:
             return
-        emb = self.model.encode([c.text for c in new_chunks], show_progress_bar=True, normalize_embeddings=True)
-        emb = np.asarray(emb, dtype="float32")
+        emb = self._encode([c.text for c in new_chunks])
         if self.index is None:
-            self.dim = emb.shape[1]
-            self.index = faiss.IndexFlatIP(self.dim)
-        self.index.add(emb)
+            self._set_index(emb)
+        else:
+            self.index.add(emb)
+            if self.vectors is not None:
+                self.vectors = np.concatenate([self.vectors, emb])
+        self.bm25.add([c.text for c in new_chunks])
         self.chunks.extend(new_chunks)
+        for d, start, end in spans:
+            self.docs[doc_key(d)] = {"hash": doc_hash(d), "rows": [start, end]}
+
+    def _set_index(self, emb: np.ndarray, evaluate: bool = True):
+        self.dim = emb.shape[1]
+        self.index = build_index(emb)
+        self.vectors = np.ascontiguousarray(emb, dtype="float32") if is_lossy(self.index) else None
+        if evaluate and not isinstance(self.index, faiss.IndexFlat):
+            self.index_report = evaluate_index(self.index, emb)
+        else:
+            self.index_report = {}
+
+    def row_vectors(self) -> np.ndarray:
+        return self.vectors if self.vectors is not None else index_vectors(self.index)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        cache = get_embedding_cache(encoder_tag(self.model, self.embed_model_name))
+        if cache is not None:
+            return cache.encode(self.model, texts, batch_size=EMBED_BATCH_SIZE, show_progress_bar=True, normalize_embeddings=True)
+        # без кэша одинаковые тексты разных документов всё равно кодируем один раз
+        uniq = list(dict.fromkeys(texts))
+        emb = self.model.encode(uniq, batch_size=EMBED_BATCH_SIZE, show_progress_bar=True, normalize_embeddings=True)
+        emb = np.asarray(emb, dtype="float32")
+        if len(uniq) == len(texts):
+            return emb
+        pos = {t: i for i, t in enumerate(uniq)}
+        return emb[[pos[t] for t in texts]]
+
+    def remove_documents(self, keys: List[str]):
+        for k in keys:
+            entry = self.docs.pop(k, None)
+            if entry:
+                start, end = entry["rows"]
+                self.deleted.update(range(start, end))
+
+    def update_documents(self, docs: List[Dict], keep: Optional[Set[str]] = None) -> Tuple[int, int]:
+        # кодируем только новые/изменённые документы, исчезнувшие помечаем удалёнными;
+        # исчезнувшие документы из keep остаются как есть: keep — ключи документов (doc_key), которые не удалось
+        # загрузить, или имена источников целиком (поиск источника не ответил — какие документы в нём, неизвестно)
+        keep = keep or set()
+        fresh = {doc_key(d): d for d in docs if d.get("text")}
+        stale = [
+            k for k, v in self.docs.items()
+            if (k not in fresh and k not in keep and k.split("|", 1)[0] not in keep) or (k in fresh and v["hash"] != doc_hash(fresh[k]))
+        ]
+        added = [d for k, d in fresh.items() if k not in self.docs or k in stale]
+        self.remove_documents(stale)
+        self.add_documents(added)
+        if self.chunks and len(self.deleted) > RAG_COMPACT_RATIO * len(self.chunks):
+            self.compact()
+        return len(added), len(stale)
+
+    def compact(self):
+        if not self.deleted or self.index is None:
+            return
+        keep = [i for i in range(len(self.chunks)) if i not in self.deleted]
+        # векторы берём без повторного кодирования; тип индекса выбирается заново по размеру
+        emb = self.row_vectors()[keep]
+        remap = {old: new for new, old in enumerate(keep)}
+        if keep:
+            self._set_index(emb)
+        else:
+            self.index = faiss.IndexFlatIP(self.dim)
+            self.vectors = None
+        self.chunks = [self.chunks[i] for i in keep]
+        self.bm25 = BM25Index.combine([(self.bm25, keep)])
+        for entry in self.docs.values():
+            start, end = entry["rows"]
+            rows = [remap[i] for i in range(start, end) if i in remap]
+            entry["rows"] = [rows[0], rows[-1] + 1] if rows else [0, 0]
+        self.deleted = set()
+
+    @classmethod
+    def merged(cls, layers: List["MiniRAG"]) -> "MiniRAG":
+        # базовый корпус МНН + слой с доп. источниками запроса; векторы копируются, не перекодируются
+        layers = [r for r in layers if r.index is not None and r.chunks]
+        rag = cls(layers[0].embed_model_name, model=layers[0].model) if layers else cls()
+        parts, views, lexical = [], [], []
+        for layer in layers:
+            live = [i for i in range(len(layer.chunks)) if i not in layer.deleted]
+            if not live:
+                continue
+            parts.append(layer.row_vectors()[live])
+            views.append((layer.chunks, live))
+            lexical.append((layer.bm25, live))
+        if parts:
+            # объединённый индекс живёт только в памяти процесса — полный прогон evaluate_index для него не нужен
+            rag._set_index(np.concatenate(parts), evaluate=False)
+            rag.chunks = ChunkView(views)
+            rag.bm25 = BM25Index.combine(lexical)
+        return rag
+
+    def chunk_meta(self, i: int) -> Dict:
+        # ленивое хранилище отдаёт метаданные без декодирования текста чанка
+        if hasattr(self.chunks, "meta"):
+            return self.chunks.meta(i)
+        return self.chunks[i].meta or {}
+
+    def live_metas(self) -> List[Dict]:
+        return [self.chunk_meta(i) for i in range(len(self.chunks)) if i not in self.deleted]
 
     def search(self, query: str, top_k: int = TOP_K) -> List[Chunk]:
-        if self.index is None or not self.chunks:
-            return []
-        q = self.model.encode([query], normalize_embeddings=True)
+        return self.search_many([query], top_k=top_k)[0]
+
+    def _dense_rows(self, queries: List[str], k: int) -> List[List[Tuple[int, float]]]:
+        # один прогон энкодера и один поиск FAISS по матрице запросов
+        q = self.model.encode(queries, normalize_embeddings=True)
         q = np.asarray(q, dtype="float32")
-        _, idxs = self.index.search(q, top_k)
-        idxs = idxs[0].tolist()
-        return [self.chunks[ix] for ix in idxs if 0 <= ix < len(self.chunks)]
-
-def evidence_block(rag: MiniRAG, query: str, top_k: int = TOP_K) -> str:
-    chunks = rag.search(query, top_k=top_k)
-    lines, seen = [], set()
-    for c in chunks:
-        m = c.meta or {}
-        key = (m.get("source",""), m.get("id",""), m.get("url",""))
-        if key in seen:
-            continue
-        seen.add(key)
-        sid = m.get("id") or m.get("pmid") or m.get("pmcid") or ""
-        label = f"[{m.get('source','SRC')}|{sid}|{m.get('year','')}] {m.get('url','')}"
-        lines.append(f"{label}\nSNIPPET: {c.text}\n")
-    return "\n---\n".join(lines) if lines else "НЕТ ДОКАЗАТЕЛЬСТВ"
\ No newline at end of file
+        dists, idxs = self.index.search(q, min(k + len(self.deleted), self.index.ntotal))
+        out = []
+        for drow, row in zip(dists.tolist(), idxs.tolist()):
+            hits = [(ix, d) for ix, d in zip(row, drow) if 0 <= ix < len(self.chunks) and ix not in self.deleted]
+            out.append(hits[:k])
+        return out
+
+    def search_many_scored(self, queries: List[str], top_k: int = TOP_K, mode: str = RETRIEVAL_MODE) -> List[List[Tuple[Chunk, float]]]:
+        if self.index is None or not self.chunks:
+            return [[] for _ in queries]
+        # BM25 нет (кэш старого формата) — только плотный поиск
+        if mode == "dense" or len(self.bm25) != len(self.chunks):
+            ranked = self._dense_rows(queries, top_k)
+        elif mode == "bm25":
+            ranked = [self.bm25.search(q, top_k, self.deleted) for q in queries]
+        else:
+            # reciprocal rank fusion: точные токены (Cmax, LLOQ, PMID, МНН) добирает BM25, перефразировки — FAISS
+            k = top_k * RRF_CANDIDATES
+            ranked = []
+            for query, dense in zip(queries, self._dense_rows(queries, k)):
+                fused: Dict[int, float] = {}
+                for hits in (dense, self.bm25.search(query, k, self.deleted)):
+                    for rank, (ix, _) in enumerate(hits):
+                        fused[ix] = fused.get(ix, 0.0) + 1.0 / (RRF_K + rank + 1)
+                ranked.append(sorted(fused.items(), key=lambda kv: -kv[1])[:top_k])
+        return [[(self.chunks[ix], score) for ix, score in hits] for hits in ranked]
+
+    def search_many(self, queries: List[str], top_k: int = TOP_K, mode: str = RETRIEVAL_MODE) -> List[List[Chunk]]:
+        return [[c for c, _ in hits] for hits in self.search_many_scored(queries, top_k=top_k, mode=mode)]
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import uuid
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки, остаются уникальные временные имена
+    fcntl = None
+
+from src.synopsis_gen.config import EMBED_ONNX_DIR, EMBED_BATCH_SIZE, EMBED_THREADS, EMBED_ONNX_MAX_DRIFT, DEBUG
+
+# тексты для сверки с PyTorch: короткие/длинные, русский/английский, числа и единицы
+PARITY_TEXTS = [
+    "Палбоциклиб — ингибитор CDK4/6, применяемый при HR+/HER2- раке молочной железы.",
+    "Cmax and AUC0-∞ were 1.3-fold higher under fed conditions compared with fasting.",
+    "LLOQ составил 0,5 нг/мл; метод ВЭЖХ-МС/МС валидирован по селективности и стабильности.",
+    "A randomized, open-label, two-period, two-sequence crossover study in healthy volunteers.",
+    "Нежелательные явления: нейтропения, усталость, тошнота, стоматит.",
+    "Washout",
+    " ".join(["The terminal half-life was approximately 29 hours and steady state was reached within 8 days."] * 12),
+]
+
+def onnx_model_dir(model_name: str, root: str = EMBED_ONNX_DIR) -> str:
+    return os.path.join(root, re.sub(r"[^a-zA-Z0-9_\-]+", "_", model_name))
+
+def _cosines(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+class OnnxEncoder:
+    # тот же интерфейс encode(), что у SentenceTransformer, поверх ONNX Runtime на CPU
+    def __init__(self, model_dir: str, variant: str = "int8", threads: int = EMBED_THREADS):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "encoder.json"), "r", encoding="utf-8") as f:
+            self.config: Dict = json.load(f)
+        self.variant = variant
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        opts = ort.SessionOptions()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, f"model.{variant}.onnx"), sess_options=opts, providers=["CPUExecutionProvider"],
+        )
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.config["dim"])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.config["max_seq_length"], return_tensors="np")
+        feed = {k: v.astype("int64") for k, v in enc.items() if k in self._inputs}
+        hidden = self.session.run(None, feed)[0]
+        if self.config.get("pooling") == "cls":
+            return hidden[:, 0]
+        mask = enc["attention_mask"][..., None].astype("float32")
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts, batch_size: int = EMBED_BATCH_SIZE, normalize_embeddings: bool = False, show_progress_bar: bool = False, **_) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), self.get_sentence_embedding_dimension()), dtype="float32")
+        # сортировка по длине: в батче тексты близкой длины, меньше паддинга
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = range(0, len(order), max(1, batch_size))
+        if show_progress_bar:
+            from tqdm import tqdm
+            batches = tqdm(batches, desc="Batches")
+        for start in batches:
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+def _write_json(path: str, obj: Dict, indent: Optional[int] = None):
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=indent)
+    os.replace(tmp, path)
+
+def export_onnx(model_name: str, model_dir: str) -> Dict:
+    # fp32-экспорт трансформера из SentenceTransformer + динамическое int8-квантование весов;
+    # пулинг и нормализация остаются в numpy. Временные файлы — с уникальным суффиксом: параллельный
+    # экспорт из другого процесса не пишет в тот же *.tmp
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    auto, tok = st[0].auto_model, st.tokenizer
+    pooling = "cls" if getattr(st[1], "pooling_mode_cls_token", False) else "mean"
+    os.makedirs(model_dir, exist_ok=True)
+    fp32 = os.path.join(model_dir, "model.fp32.onnx")
+    int8 = os.path.join(model_dir, "model.int8.onnx")
+    suffix = f".{uuid.uuid4().hex[:8]}.tmp"
+    dummy = tok(["export"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        torch.onnx.export(
+            auto, tuple(dummy[n] for n in names), fp32 + suffix,
+            input_names=names, output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14,
+        )
+    os.replace(fp32 + suffix, fp32)
+    quantize_dynamic(fp32, int8 + suffix, weight_type=QuantType.QInt8)
+    os.replace(int8 + suffix, int8)
+    tok.save_pretrained(model_dir)
+    config = {
+        "model": model_name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "pooling": pooling,
+    }
+    _write_json(os.path.join(model_dir, "encoder.json"), config)
+    report = {v: parity_check(st, OnnxEncoder(model_dir, variant=v)) for v in ("int8", "fp32")}
+    # parity.json пишется последним — по нему load_onnx_encoder считает экспорт завершённым
+    _write_json(os.path.join(model_dir, "parity.json"), report, indent=2)
+    return report
+
+def parity_check(reference, encoder, texts: Optional[List[str]] = None) -> Dict:
+    # косинус между векторами PyTorch и ONNX на одних и тех же текстах
+    texts = texts or PARITY_TEXTS
+    ref = np.asarray(reference.encode(texts, normalize_embeddings=True), dtype="float32")
+    got = encoder.encode(texts, normalize_embeddings=True)
+    cos = _cosines(ref, got)
+    report = {
+        "texts": len(texts),
+        "mean_cosine": round(float(cos.mean()), 6),
+        "min_cosine": round(float(cos.min()), 6),
+        "max_drift": round(float(1.0 - cos.min()), 6),
+    }
+    if DEBUG:
+        print(f"ONNX parity ({getattr(encoder, 'variant', '?')}):", report)
+    return report
+
+def _read_parity(model_dir: str) -> Optional[Dict]:
+    parity_path = os.path.join(model_dir, "parity.json")
+    if os.path.exists(parity_path) and os.path.exists(os.path.join(model_dir, "encoder.json")):
+        with open(parity_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+def load_onnx_encoder(model_name: str) -> OnnxEncoder:
+    model_dir = onnx_model_dir(model_name)
+    report = _read_parity(model_dir)
+    if report is None:
+        os.makedirs(model_dir, exist_ok=True)
+        # экспорт один на машину: остальные воркеры ждут блокировку и берут готовый результат
+        with open(os.path.join(model_dir, ".lock"), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            report = _read_parity(model_dir) or export_onnx(model_name, model_dir)
+    # int8 заметно уводит векторы — берём fp32-граф (всё равно быстрее PyTorch на CPU)
+    variant = "int8" if report.get("int8", {}).get("max_drift", 1.0) <= EMBED_ONNX_MAX_DRIFT else "fp32"
+    if DEBUG:
+        print(f"ONNX encoder: {model_name} ({variant}), parity:", report.get(variant))
+    return OnnxEncoder(model_dir, variant=variant)
@@ -0,0 +1,38 @@
+import time
+import threading
+
+from src.synopsis_gen.config import NCBI_API_KEY, NCBI_RPS
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        # всплеск ограничен capacity: за любую секунду проходит не больше capacity + rate запросов,
+        # поэтому по умолчанию 1 — при NCBI_RPS чуть ниже лимита NCBI (3 и 10 в секунду) лимит не превышается
+        self.rate = max(float(rate), 1e-3)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = max(self._blocked_until - now, (1.0 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def penalize(self, seconds: float):
+        # сервер ответил 429 — притормаживаем всех потребителей бакета, а не только текущий поток
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+NCBI_LIMITER = TokenBucket(NCBI_RPS)
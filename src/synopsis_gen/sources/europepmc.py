@@ -1,15 +1,16 @@
 import fitz
 from docx import Document as DocxDocument
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from src.synopsis_gen.text_utils import normalize_space
-from src.synopsis_gen.http import SESSION
-from src.synopsis_gen.config import HTTP_TIMEOUT, EUROPEPMC_PAGESIZE
+from src.synopsis_gen.http import cached_get, safe_get
+from src.synopsis_gen.sources.jats import parse_jats_sections, join_sections
+from src.synopsis_gen.config import HTTP_TIMEOUT, EUROPEPMC_PAGESIZE, MAX_TEXT_CHARS
 
 def europepmc_search(query: str, page_size: int = EUROPEPMC_PAGESIZE) -> List[Dict]:
     url = "https://www.ebi.ac.uk/europepmc/webservices/rest/search"
     params = {"query": query, "format": "json", "pageSize": str(page_size)}
-    r = SESSION.get(url, params=params, timeout=HTTP_TIMEOUT)
+    r = cached_get(url, params=params, timeout=HTTP_TIMEOUT)
     r.raise_for_status()
     hits = r.json().get("resultList", {}).get("result", []) or []
     out = []
@@ -30,4 +31,12 @@ def europepmc_search(query: str, page_size: int = EUROPEPMC_PAGESIZE) -> List[Di
             "pmid": pmid,
             "text": normalize_space(f"{title}. {abstract}")
         })
-    return out
\ No newline at end of file
+    return out
+
+def europepmc_fulltext(pmcid: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[Dict]:
+    # JATS XML есть только у статей из open access подмножества; иначе 404 — тогда вызывающий идёт в HTML
+    url = f"https://www.ebi.ac.uk/europepmc/webservices/rest/{pmcid}/fullTextXML"
+    r = safe_get(url, timeout=HTTP_TIMEOUT)
+    if not r or not r.content:
+        return None
+    return join_sections(parse_jats_sections(r.content), max_chars)
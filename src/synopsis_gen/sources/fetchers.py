@@ -1,46 +1,66 @@
-from typing import Optional
+import re
+from typing import Dict, Optional
 from bs4 import BeautifulSoup
-import fitz
+import requests
 from docx import Document as DocxDocument
 
 from src.synopsis_gen.text_utils import normalize_space
 from src.synopsis_gen.http import safe_get
+from src.synopsis_gen.sources.pdf_extract import fetch_pdf_text
+from src.synopsis_gen.sources.europepmc import europepmc_fulltext
 from src.synopsis_gen.config import HTTP_TIMEOUT, MAX_TEXT_CHARS
 
+_PMCID_RE = re.compile(r"PMC\d+", re.I)
+
+def _clip(text: str, max_chars: int) -> Optional[str]:
+    return (text[:max_chars] if max_chars and len(text) > max_chars else text) or None
+
+# блочные элементы HTML: между ними — пустая строка, граница раздела/абзаца для iter_chunks
+_HTML_BLOCK_TAGS = [
+    "p", "div", "section", "article", "header", "footer", "aside", "nav", "main", "li", "ul", "ol", "dl", "dt", "dd",
+    "table", "tr", "caption", "figure", "figcaption", "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+]
+_BLOCK_MARK = "\x1e"
+
+def _html_text(r: requests.Response, max_chars: int, article: bool = False) -> Optional[str]:
+    soup = BeautifulSoup(r.text, "lxml")
+    main = (soup.find("article") or soup) if article else soup
+    for tag in main(["script", "style", "noscript"]):
+        tag.decompose()
+    # пробелы схлопываем только внутри блока: переводы строк разметки внутри абзаца — обычный пробел,
+    # а границы абзацев/заголовков остаются пустой строкой
+    for tag in main(_HTML_BLOCK_TAGS):
+        tag.insert_before(_BLOCK_MARK)
+        tag.append(_BLOCK_MARK)
+    blocks = (normalize_space(b) for b in main.get_text().split(_BLOCK_MARK))
+    return _clip("\n\n".join(b for b in blocks if b), max_chars)
+
 def pmc_fetch_fulltext(pmc_url: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[str]:
     r = safe_get(pmc_url, timeout=HTTP_TIMEOUT)
     if not r:
         return None
-    soup = BeautifulSoup(r.text, "lxml")
-    main = soup.find("article") or soup
-    for tag in main(["script", "style", "noscript"]):
-        tag.decompose()
-    text = normalize_space(main.get_text(" ", strip=True))
-    return (text[:max_chars] if max_chars and len(text) > max_chars else text) or None
+    return _html_text(r, max_chars, article=True)
+
+def pmc_fulltext_doc(pmcid: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[Dict]:
+    # сначала JATS XML из EuropePMC (только разделы тела статьи, с заголовками); страницу PMC разбираем,
+    # только если XML нет
+    doc = europepmc_fulltext(pmcid, max_chars=max_chars)
+    if doc:
+        return doc
+    txt = pmc_fetch_fulltext(f"https://pmc.ncbi.nlm.nih.gov/articles/{pmcid}/", max_chars=max_chars)
+    return {"text": txt} if txt else None
 
-def fetch_url_text(url: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[str]:
+def fetch_url_doc(url: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[Dict]:
+    # {"text"} или, для статьи PMC, {"text", "sections", "pmcid"}: seed URL PMC идут тем же путём JATS,
+    # что и полные тексты из выдачи EuropePMC, и не теряют разделов
     if "pmc.ncbi.nlm.nih.gov/articles/" in url:
-        txt = pmc_fetch_fulltext(url, max_chars=max_chars)
-        if txt:
-            return txt
+        m = _PMCID_RE.search(url)
+        doc = pmc_fulltext_doc(m.group(0).upper(), max_chars=max_chars) if m else None
+        if doc:
+            return {**doc, "pmcid": m.group(0).upper()}
     if url.lower().endswith(".pdf"):
-        r = safe_get(url, timeout=70)
-        if not r:
-            return None
-        try:
-            doc = fitz.open(stream=r.content, filetype="pdf")
-            parts = []
-            for i in range(min(doc.page_count, 30)):
-                parts.append(doc.load_page(i).get_text("text"))
-            text = normalize_space(" ".join(parts))
-            return (text[:max_chars] if max_chars and len(text) > max_chars else text) or None
-        except Exception:
-            return None
+        txt = fetch_pdf_text(url, max_chars=max_chars)
+        return {"text": txt} if txt else None
     r = safe_get(url, timeout=HTTP_TIMEOUT)
-    if not r:
-        return None
-    soup = BeautifulSoup(r.text, "lxml")
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
-    text = normalize_space(soup.get_text(" ", strip=True))
-    return (text[:max_chars] if max_chars and len(text) > max_chars else text) or None
\ No newline at end of file
+    txt = _html_text(r, max_chars) if r else None
+    return {"text": txt} if txt else None
@@ -0,0 +1,122 @@
+import re
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+from src.synopsis_gen.text_utils import normalize_space
+
+# внутри разделов берём только текст; таблицы и рисунки — одной подписью
+_BLOCK_TAGS = {"p", "list-item", "disp-quote", "def", "statement"}
+_CAPTION_TAGS = {"fig", "table-wrap", "boxed-text"}
+_SKIP_TAGS = {"table", "graphic", "media", "disp-formula", "inline-formula", "alternatives", "supplementary-material", "ref-list"}
+
+# после удаления ссылок на литературу остаются "( )", "[,]" и пробел перед знаком препинания
+_EMPTY_BRACKETS_RE = re.compile(r"\s*[\[(][\s,;–-]*[\])]")
+_SPACE_PUNCT_RE = re.compile(r"\s+([,.;:)\]])")
+
+def _drop(el):
+    # удаляем элемент, сохраняя хвостовой текст
+    parent = el.getparent()
+    if parent is None:
+        return
+    tail = el.tail or ""
+    prev = el.getprevious()
+    if prev is not None:
+        prev.tail = (prev.tail or "") + tail
+    else:
+        parent.text = (parent.text or "") + tail
+    parent.remove(el)
+
+def _text(el) -> str:
+    text = normalize_space("".join(el.itertext()))
+    return _SPACE_PUNCT_RE.sub(r"\1", _EMPTY_BRACKETS_RE.sub("", text))
+
+def _blocks(el, out: List[str]):
+    # абзацы раздела по порядку; заголовки вложенных подразделов — отдельной строкой
+    for child in el:
+        tag = child.tag if isinstance(child.tag, str) else ""
+        if not tag or tag in _SKIP_TAGS or tag == "label":
+            continue
+        if tag == "title":
+            if el.tag == "sec" and el.getparent() is not None and el.getparent().tag == "sec":
+                out.append(_text(child))
+        elif tag == "sec" or tag == "list":
+            _blocks(child, out)
+        elif tag in _CAPTION_TAGS:
+            cap = child.find("caption")
+            if cap is not None:
+                out.append(_text(cap))
+        elif tag in _BLOCK_TAGS:
+            for sub in child.findall(".//table-wrap") + child.findall(".//fig"):
+                _drop(sub)
+            out.append(_text(child))
+
+def _section(el, title: Optional[str] = None) -> Optional[Dict]:
+    for x in list(el.iter("xref")):
+        if x.get("ref-type") == "bibr":
+            _drop(x)
+    parts: List[str] = []
+    _blocks(el, parts)
+    text = "\n".join(p for p in parts if p)
+    if not text:
+        return None
+    if title is None:
+        t = el.find("title")
+        title = _text(t) if t is not None else ""
+    return {"title": title, "text": text}
+
+def parse_jats_sections(data: bytes) -> List[Dict]:
+    # потоковый разбор JATS: разделы <body> верхнего уровня обрабатываются и сразу освобождаются;
+    # <front> выбрасывается целиком, <back> (список литературы) не читаем вовсе
+    sections: List[Dict] = []
+    in_body = False
+    loose: List = []
+    try:
+        for event, el in etree.iterparse(BytesIO(data), events=("start", "end"), recover=True, huge_tree=True):
+            tag = el.tag if isinstance(el.tag, str) else ""
+            if event == "start":
+                if tag == "body":
+                    in_body = True
+                continue
+            if tag == "front":
+                el.clear()
+            elif tag == "body":
+                break
+            elif in_body and el.getparent() is not None and el.getparent().tag == "body":
+                if tag == "sec":
+                    sec = _section(el)
+                    if sec:
+                        sections.append(sec)
+                elif tag in _BLOCK_TAGS or tag in _CAPTION_TAGS:
+                    # абзацы прямо в <body> (короткие сообщения без разделов)
+                    loose.append(el)
+                    continue
+                el.clear()
+    except etree.XMLSyntaxError:
+        pass
+    if loose:
+        body = etree.Element("sec")
+        body.extend(loose)
+        sec = _section(body, title="")
+        if sec:
+            sections.insert(0, sec)
+    return sections
+
+def join_sections(sections: List[Dict], max_chars: int) -> Optional[Dict]:
+    # текст документа — разделы через пустую строку (граница раздела для чанкера);
+    # рядом — [(смещение начала, заголовок)], по нему чанкам проставляется раздел
+    parts, spans, pos = [], [], 0
+    for sec in sections:
+        if max_chars and pos >= max_chars:
+            break
+        text = sec["text"]
+        spans.append([pos, sec["title"]])
+        parts.append(text)
+        pos += len(text) + 2
+    if not parts:
+        return None
+    text = "\n\n".join(parts)
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+    return {"text": text, "sections": spans}
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import fitz
+
+from src.synopsis_gen.text_utils import normalize_space
+from src.synopsis_gen.config import MAX_TEXT_CHARS, PDF_MAX_BYTES, PDF_MAX_PAGES, PDF_TIMEOUT, PDF_WORKERS, DEBUG
+
+def extract_pdf_text(path: str, max_chars: int = MAX_TEXT_CHARS, max_pages: int = PDF_MAX_PAGES) -> Optional[str]:
+    # выполняется в дочернем процессе: постранично, пока не набрали max_chars
+    try:
+        doc = fitz.open(path)
+    except Exception:
+        return None
+    parts, total = [], 0
+    with doc:
+        for i in range(min(doc.page_count, max_pages)):
+            try:
+                page = normalize_space(doc.load_page(i).get_text("text"))
+            except Exception:
+                continue
+            parts.append(page)
+            total += len(page) + 1
+            if max_chars and total >= max_chars:
+                break
+    text = " ".join(p for p in parts if p)
+    return (text[:max_chars] if max_chars and len(text) > max_chars else text) or None
+
+class PdfExtractor:
+    # spawn, а не fork: в процессе сервиса уже есть потоки, torch и faiss
+    def __init__(self, workers: int = PDF_WORKERS, timeout: float = PDF_TIMEOUT):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # задач в пуле не больше, чем процессов: таймаут отсчитывается от начала разбора, а не от ожидания в очереди
+        self._slots = threading.BoundedSemaphore(self.workers)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _reset(self, pool: ProcessPoolExecutor):
+        # зависшую задачу из ProcessPoolExecutor не отменить — гасим процессы пула и создаём новый
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        for proc in list((getattr(pool, "_processes", None) or {}).values()):
+            proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def extract(self, path: str, max_chars: int = MAX_TEXT_CHARS) -> Optional[str]:
+        with self._slots:
+            # вторая попытка — для документов, оборванных вместе с пулом из-за чужого зависшего PDF
+            for attempt in range(2):
+                pool = self._get_pool()
+                try:
+                    return pool.submit(extract_pdf_text, path, max_chars).result(timeout=self.timeout)
+                except FutureTimeout:
+                    if DEBUG:
+                        print(f"PDF extraction timed out after {self.timeout:.0f}s:", path)
+                    self._reset(pool)
+                    return None
+                except (BrokenProcessPool, CancelledError, RuntimeError) as e:
+                    if DEBUG:
+                        print("PDF pool restarted, retrying:", str(e)[:200] or type(e).__name__)
+                    self._reset(pool)
+                except Exception as e:
+                    if DEBUG:
+                        print("PDF extraction failed:", str(e)[:200])
+                    return None
+        return None
+
+PDF_EXTRACTOR = PdfExtractor()
+
+def fetch_pdf_text(url: str, max_chars: int = MAX_TEXT_CHARS, timeout: int = 70) -> Optional[str]:
+    # http и кэш импортируем здесь: дочерние процессы импортируют этот модуль ради extract_pdf_text,
+    # им не нужны ни SQLite-кэш, ни пул планировщика
+    from src.synopsis_gen.http import download_to_file
+    from src.synopsis_gen.http_cache import HTTP_CACHE
+
+    # в кэше — извлечённый текст, а не сам PDF; ETag/Last-Modified оригинала сохраняются для ревалидации
+    key = {"pdf_text": max_chars, "max_pages": PDF_MAX_PAGES}
+    entry, fresh = HTTP_CACHE.lookup(url, key) if HTTP_CACHE else (None, False)
+    if fresh:
+        return entry.body.decode("utf-8") or None
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="synopsis-")
+    os.close(fd)
+    try:
+        r = download_to_file(url, path, max_bytes=PDF_MAX_BYTES, timeout=timeout, headers=entry.validators() if entry else None)
+        if r is None:
+            return None
+        if r.status_code == 304 and entry is not None:
+            HTTP_CACHE.revalidate(entry)
+            return entry.body.decode("utf-8") or None
+        text = PDF_EXTRACTOR.extract(path, max_chars=max_chars)
+        if HTTP_CACHE is not None:
+            if text:
+                r._content = text.encode("utf-8")
+                r.encoding = "utf-8"
+                r.headers["Content-Type"] = "text/plain; charset=utf-8"
+            HTTP_CACHE.store(url, key, r, keep=bool(text))
+        return text
+    finally:
+        os.remove(path)
@@ -1,48 +1,154 @@
 import fitz
 from docx import Document as DocxDocument
-from typing import List, Dict
+from io import BytesIO
+from typing import Iterator, List, Dict, Optional, Union
 
-import time
-from bs4 import BeautifulSoup
+import requests
+from lxml import etree
 
 from src.synopsis_gen.text_utils import normalize_space
 from src.synopsis_gen.http import ncbi_get
-from src.synopsis_gen.config import HTTP_TIMEOUT, PUBMED_RETMX, PUBMED_EFETCH_BATCH, PUBMED_MIN_DELAY
+from src.synopsis_gen.http_cache import HTTP_CACHE
+from src.synopsis_gen.config import HTTP_TIMEOUT, PUBMED_RETMX, PUBMED_EFETCH_BATCH, DEBUG
 
-def pubmed_search(query: str, retmax: int = PUBMED_RETMX) -> List[str]:
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    params = {"db": "pubmed", "term": query, "retmode": "json", "retmax": str(retmax)}
-    r = ncbi_get(url, params=params, timeout=HTTP_TIMEOUT)
-    return r.json().get("esearchresult", {}).get("idlist", [])
+ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 
-def pubmed_fetch_abstracts(pmids: List[str]) -> List[Dict]:
-    if not pmids:
-        return []
-    url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+_MONTHS = {m: i for i, m in enumerate(["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
 
+def pubmed_search(queries: Union[str, List[str]], retmax: int = PUBMED_RETMX) -> Dict:
+    # у каждой темы своя квота (как раньше, max(8, retmax // 2) PMID), чтобы одна тема не вытесняла другие;
+    # все esearch кладут результаты на один history server (WebEnv), у каждой темы — свой query_key
+    if isinstance(queries, str):
+        queries = [queries]
+    per_topic = max(8, retmax // 2) if len(queries) > 1 else retmax
+    webenv, topics = "", []
+    for q in queries:
+        if not q:
+            continue
+        params = {"db": "pubmed", "term": q, "retmode": "json", "retmax": str(per_topic), "sort": "relevance", "usehistory": "y"}
+        if webenv:
+            params["WebEnv"] = webenv
+        r = ncbi_get(ESEARCH_URL, params=params, timeout=HTTP_TIMEOUT, cache=False)
+        res = r.json().get("esearchresult", {})
+        webenv = res.get("webenv", "") or webenv
+        topics.append({"term": q, "ids": res.get("idlist", []), "count": int(res.get("count") or 0), "query_key": res.get("querykey", "")})
+    return {
+        "ids": list(dict.fromkeys(p for t in topics for p in t["ids"])),
+        "count": sum(t["count"] for t in topics),
+        "webenv": webenv,
+        "topics": topics,
+    }
+
+def pubmed_url(pmid: str) -> str:
+    return f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else ""
+
+def _text(el) -> str:
+    return normalize_space("".join(el.itertext())) if el is not None else ""
+
+def _pub_date(pubdate) -> str:
+    # PubDate: Year/Month/Day (Month бывает "Mar" или "03") либо свободная MedlineDate ("2019 Mar-Apr")
+    if pubdate is None:
+        return ""
+    year = (pubdate.findtext("Year") or "").strip()
+    if not year:
+        return normalize_space(pubdate.findtext("MedlineDate") or "")
+    month = (pubdate.findtext("Month") or "").strip()
+    month = _MONTHS.get(month[:3].lower(), int(month) if month.isdigit() else 0)
+    day = (pubdate.findtext("Day") or "").strip()
+    if not month:
+        return year
+    if not day.isdigit():
+        return f"{year}-{month:02d}"
+    return f"{year}-{month:02d}-{int(day):02d}"
+
+def _article(el) -> Dict:
+    cit = el.find("MedlineCitation")
+    art = cit.find("Article") if cit is not None else None
+    pmid = (cit.findtext("PMID") if cit is not None else "") or ""
+    title = _text(art.find("ArticleTitle")) if art is not None else ""
+    parts = []
+    for ab in (art.findall("Abstract/AbstractText") if art is not None else []):
+        label = ab.get("Label")
+        txt = _text(ab)
+        if txt:
+            parts.append(f"{label}: {txt}" if label else txt)
+    journal = art.find("Journal") if art is not None else None
+    pub_date = _pub_date(journal.find("JournalIssue/PubDate")) if journal is not None else ""
+    mesh = [_text(d) for d in (cit.findall("MeshHeadingList/MeshHeading/DescriptorName") if cit is not None else [])]
+    pmcid = ""
+    for aid in el.findall("PubmedData/ArticleIdList/ArticleId"):
+        if aid.get("IdType") == "pmc":
+            pmcid = (aid.text or "").strip()
+    return {
+        "source": "PubMed",
+        "id": pmid,
+        "title": title,
+        "year": pub_date[:4] if pub_date[:4].isdigit() else "",
+        "url": pubmed_url(pmid),
+        "pmid": pmid,
+        "pmcid": pmcid,
+        "journal": normalize_space(journal.findtext("Title") or "") if journal is not None else "",
+        "pub_date": pub_date,
+        "mesh": [m for m in mesh if m],
+        "text": normalize_space(f"{title}. {' '.join(parts)}"),
+    }
+
+def iter_pubmed_articles(data: bytes) -> Iterator[Dict]:
+    # потоковый разбор efetch: каждая PubmedArticle разбирается и сразу освобождается вместе с уже пройденными.
+    # тело ответа уже в памяти целиком — оно же уходит в HTTP-кэш, а размер ограничен PUBMED_EFETCH_BATCH;
+    # разбор по ходу не строит дерево всего ответа
+    for _, el in etree.iterparse(BytesIO(data), events=("end",), tag="PubmedArticle", recover=True, huge_tree=True):
+        yield _article(el)
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+
+def _efetch(params: Dict, batch: List[str]) -> List[Dict]:
+    # кэш — по самой пачке PMID, а не по WebEnv или термину: esearch не кэшируется, и окно retstart/retmax
+    # того же термина завтра может содержать другие статьи. Поэтому ответ по WebEnv кладём под ключ пачки,
+    # только если в нём ровно её PMID; по явному списку — если записи есть и все из пачки (снятые статьи NCBI не отдаёт)
+    cache_params = {"db": "pubmed", "id": ",".join(batch)}
+    entry, fresh = HTTP_CACHE.lookup(EFETCH_URL, cache_params) if HTTP_CACHE else (None, False)
+    if fresh:
+        return list(iter_pubmed_articles(entry.body))
+    r = ncbi_get(EFETCH_URL, params={"db": "pubmed", "retmode": "xml", **params}, timeout=60, post=True)
+    docs = list(iter_pubmed_articles(r.content))
+    got = {d["pmid"] for d in docs}
+    matches = got == set(batch) if "id" not in params else bool(docs) and got <= set(batch)
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.store(EFETCH_URL, cache_params, r, keep=matches)
+    return docs if matches or "id" in params else []
+
+def pubmed_fetch_abstracts(pmids: Union[List[str], Dict]) -> List[Dict]:
+    # pmids — список PMID или результат pubmed_search (тогда efetch идёт по WebEnv, окнами query_key каждой темы)
+    search = pmids if isinstance(pmids, dict) else None
+    if search:
+        topics = [(t["ids"], t.get("query_key", "")) for t in search.get("topics", [])]
+    else:
+        topics = [(list(pmids), "")]
     out: List[Dict] = []
-    for i in range(0, len(pmids), PUBMED_EFETCH_BATCH):
-        batch = pmids[i:i+PUBMED_EFETCH_BATCH]
-        params = {"db": "pubmed", "id": ",".join(batch), "retmode": "xml"}
-        if i > 0:
-            time.sleep(PUBMED_MIN_DELAY)
-        r = ncbi_get(url, params=params, timeout=60)
-        soup = BeautifulSoup(r.text, "lxml-xml")
-        for art in soup.find_all("PubmedArticle"):
-            pmid = art.find("PMID").get_text(strip=True) if art.find("PMID") else ""
-            title = art.find("ArticleTitle").get_text(" ", strip=True) if art.find("ArticleTitle") else ""
-            abs_tag = art.find("Abstract")
-            abstract = abs_tag.get_text(" ", strip=True) if abs_tag else ""
-            year = ""
-            pubdate = art.find("PubDate")
-            if pubdate and pubdate.find("Year"):
-                year = pubdate.find("Year").get_text(strip=True)
-            out.append({
-                "source": "PubMed",
-                "id": pmid,
-                "title": title,
-                "year": year,
-                "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else "",
-                "text": normalize_space(f"{title}. {abstract}")
-            })
-    return out
\ No newline at end of file
+    seen = set()
+    for ids, query_key in topics:
+        for i in range(0, len(ids), PUBMED_EFETCH_BATCH):
+            batch = ids[i:i + PUBMED_EFETCH_BATCH]
+            if all(p in seen for p in batch):
+                # статья нашлась и по предыдущей теме
+                continue
+            docs = []
+            if search and search.get("webenv") and query_key:
+                window = {"retstart": str(i), "retmax": str(len(batch))}
+                try:
+                    docs = _efetch({"WebEnv": search["webenv"], "query_key": query_key, **window}, batch)
+                except requests.HTTPError as e:
+                    if DEBUG:
+                        print("efetch by WebEnv failed, falling back to PMID list:", str(e)[:200])
+            if not docs:
+                # WebEnv истёк, его нет или окно вернуло не те статьи — те же записи по явному списку PMID
+                rest = [p for p in batch if p not in seen]
+                docs = _efetch({"id": ",".join(rest)}, rest)
+            for d in docs:
+                if d["pmid"] not in seen:
+                    seen.add(d["pmid"])
+                    out.append(d)
+    return out
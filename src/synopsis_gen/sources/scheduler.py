@@ -0,0 +1,86 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from src.synopsis_gen.config import FETCH_MAX_IN_FLIGHT, FETCH_PER_HOST, FETCH_HOST_LIMITS, DEBUG
+
+def host_of(url: str) -> str:
+    return (urlparse(url).netloc or "").lower()
+
+class FetchScheduler:
+    def __init__(self, max_in_flight: int = FETCH_MAX_IN_FLIGHT, per_host: int = FETCH_PER_HOST, host_limits: Optional[Dict[str, int]] = None):
+        self.per_host = max(1, per_host)
+        self.host_limits = host_limits if host_limits is not None else FETCH_HOST_LIMITS
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="fetch")
+        # очередь и число выполняемых задач по хостам
+        self._queues: Dict[str, Deque[Tuple]] = {}
+        self._active: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, host: str) -> int:
+        return self.host_limits.get(host, self.per_host)
+
+    def submit(self, host: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            self._queues.setdefault(host, deque()).append((fut, fn, args, kwargs))
+        self._dispatch(host)
+        return fut
+
+    def _dispatch(self, host: str):
+        # в пул уходят только задачи хоста со свободным слотом: ждущие своей очереди не занимают потоки,
+        # и десяток URL одного сайта не блокирует остальные хосты
+        while True:
+            with self._lock:
+                queue = self._queues.get(host)
+                if not queue or self._active.get(host, 0) >= self._limit(host):
+                    return
+                fut, fn, args, kwargs = queue.popleft()
+                # отменённые в gather до запуска просто выбрасываем
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                self._active[host] = self._active.get(host, 0) + 1
+            self._pool.submit(self._run, host, fut, fn, args, kwargs)
+
+    def _run(self, host: str, fut: Future, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        result, error = None, None
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            error = e
+        with self._lock:
+            self._active[host] -= 1
+        self._dispatch(host)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def gather(self, futures: List[Future], deadline: Optional[float] = None, default: Any = None, since: Optional[float] = None) -> List[Any]:
+        # deadline отсчитывается от since (time.monotonic() начала сбора), а не от вызова gather:
+        # у каждого источника свой фиксированный срок, сроки не складываются друг за другом.
+        # результаты в порядке постановки задач, а не завершения — корпус детерминирован
+        timeout = None
+        if deadline is not None:
+            timeout = max(0.0, deadline - (time.monotonic() - since)) if since is not None else deadline
+        wait(futures, timeout=timeout)
+        out = []
+        for f in futures:
+            if not f.done():
+                f.cancel()
+                if DEBUG:
+                    print("Fetch missed deadline")
+                out.append(default)
+                continue
+            try:
+                out.append(f.result())
+            except Exception as e:
+                if DEBUG:
+                    print("Fetch failed:", str(e)[:200])
+                out.append(default)
+        return out
+
+SCHEDULER = FetchScheduler()
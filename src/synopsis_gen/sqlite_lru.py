@@ -0,0 +1,81 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from .config import DEBUG
+
+class SqliteLruStore:
+    # общая основа HTTP- и LLM-кэша: таблица responses (key + свои колонки + stored_at, accessed_at, size)
+    # в SQLite с WAL, потолок размера с вытеснением давно не читанных записей и, если задан, срок жизни
+    def __init__(self, path: str, columns: Dict[str, str], max_bytes: int, ttl: Optional[float] = None, name: str = "SQLite"):
+        self.columns: List[str] = list(columns)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        cols = "".join(f"{c} {t}, " for c, t in columns.items())
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, {cols}stored_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self._db.commit()
+
+    def count(self, obj, name: str):
+        # счётчики кэшей меняют потоки планировщика одновременно — только под блокировкой хранилища
+        with self.lock:
+            setattr(obj, name, getattr(obj, name) + 1)
+
+    def get(self, key: str) -> Optional[Dict]:
+        # запись с её stored_at; истёкшая по ttl — как отсутствующая. Чтение продлевает жизнь записи в LRU
+        now = time.time()
+        with self.lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(self.columns)}, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[-1] >= self.ttl):
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return dict(zip(self.columns + ["stored_at"], row))
+
+    def put(self, key: str, values: Dict, size: int) -> bool:
+        if size > self.max_bytes:
+            return False
+        now = time.time()
+        names = ["key"] + self.columns + ["stored_at", "accessed_at", "size"]
+        with self.lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO responses ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                (key, *(values.get(c) for c in self.columns), now, now, size),
+            )
+            self._evict(now)
+            self._db.commit()
+        return True
+
+    def touch(self, key: str) -> float:
+        # запись снова свежая (например, ответ 304)
+        now = time.time()
+        with self.lock:
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+        return now
+
+    def _evict(self, now: float):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # LRU: выбрасываем давно не читанные записи, пока не уложимся в лимит
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        if DEBUG:
+            print(f"{self.name} cache evicted down to {total / 1e6:.1f} MB")
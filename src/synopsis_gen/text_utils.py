@@ -1,6 +1,6 @@
 import re
 import hashlib
-from typing import List
+from typing import Iterator, List, Tuple
 
 from .config import CHUNK_SIZE, CHUNK_OVERLAP
 
@@ -10,16 +10,63 @@ def normalize_space(s: str) -> str:
 def short_hash(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()[:10]
 
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
-    text = normalize_space(text)
+# граница предложения: .!? (+ закрывающие кавычки/скобки), пробел и заглавная буква; пустая строка — граница раздела.
+# десятичные (0.5) и "Fig. 2" не режутся: после точки нет пробела или дальше не заглавная
+_BOUNDARY_RE = re.compile(r"\n\s*\n|(?<=[.!?…])[\"'»”)\]]*\s+(?=[A-ZА-ЯЁ\"«(\[])")
+
+def _spans(text: str, max_len: int) -> Iterator[Tuple[int, int, bool]]:
+    # (начало, конец, конец_раздела); предложения длиннее max_len режутся по пробелу
+    pos = 0
+    for m in _BOUNDARY_RE.finditer(text):
+        end = m.start() + len(m.group().rstrip())
+        yield from _split_long(text, pos, end, max_len, "\n" in m.group())
+        pos = m.end()
+    yield from _split_long(text, pos, len(text.rstrip()), max_len, True)
+
+def _split_long(text: str, start: int, end: int, max_len: int, hard: bool) -> Iterator[Tuple[int, int, bool]]:
+    while end - start > max_len:
+        cut = text.rfind(" ", start + 1, start + max_len)
+        if cut <= start:
+            cut = start + max_len
+        yield start, cut, False
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if end > start:
+        yield start, end, hard
+
+def iter_chunks(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[Tuple[int, int, str]]:
+    # генератор (начало, конец, текст): смещения — в исходном тексте документа, текст чанка нормализован;
+    # чанки собираются из целых предложений, перекрытие — хвостовыми предложениями предыдущего чанка
     if not text:
-        return []
-    chunks, i = [], 0
-    step = max(1, chunk_size - overlap)
-    while i < len(text):
-        chunks.append(text[i:i+chunk_size])
-        i += step
-    return chunks
+        return
+    lead = len(text) - len(text.lstrip())
+    if len(text) - lead <= chunk_size:
+        chunk = normalize_space(text)
+        if chunk:
+            yield lead, len(text.rstrip()), chunk
+        return
+    window: List[Tuple[int, int]] = []
+    fresh = False
+    for start, end, hard in _spans(text, chunk_size):
+        if window and end - window[0][0] > chunk_size:
+            if fresh:
+                yield window[0][0], window[-1][1], normalize_space(text[window[0][0]:window[-1][1]])
+            tail = [sp for sp in window if window[-1][1] - sp[0] <= overlap]
+            while tail and end - tail[0][0] > chunk_size:
+                tail.pop(0)
+            window, fresh = tail, False
+        window.append((start, end))
+        fresh = True
+        # раздел закончился и чанк уже не мелкий — следующий раздел начинаем с чистого чанка
+        if hard and window[-1][1] - window[0][0] >= chunk_size // 2:
+            yield window[0][0], window[-1][1], normalize_space(text[window[0][0]:window[-1][1]])
+            window, fresh = [], False
+    if window and fresh:
+        yield window[0][0], window[-1][1], normalize_space(text[window[0][0]:window[-1][1]])
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    return [chunk for _, _, chunk in iter_chunks(text, chunk_size, overlap)]
 
 def clean_final_text(s: str) -> str:
     s = s or ""
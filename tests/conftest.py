@@ -0,0 +1,9 @@
+import os
+import sys
+
+# тесты не должны создавать кэши HTTP/LLM/эмбеддингов в каталоге репозитория
+os.environ.setdefault("HTTP_CACHE_DIR", "")
+os.environ.setdefault("LLM_CACHE_DIR", "")
+os.environ.setdefault("EMBED_CACHE_DIR", "")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,42 @@
+from src.synopsis_gen.rag.bm25 import BM25Index, tokenize
+
+DOCS = [
+    "Cmax and AUC0-∞ under fed conditions",
+    "LC-MS/MS method validated with LLOQ 0.5 ng/mL",
+    "Washout period of 14 days between periods",
+    "Adverse events included neutropenia",
+]
+
+def _index() -> BM25Index:
+    bm = BM25Index()
+    bm.add(DOCS)
+    return bm
+
+def test_tokenize_keeps_compound_and_parts():
+    toks = tokenize("LC-MS/MS 0.5")
+    assert {"lc-ms/ms", "lc", "ms", "0.5", "0", "5"} <= set(toks)
+
+def test_exact_tokens_rank_first():
+    bm = _index()
+    assert bm.search("LLOQ", 2)[0][0] == 1
+    assert bm.search("auc0-∞", 2)[0][0] == 0
+    assert bm.search("nothing matches", 3) == []
+
+def test_exclude_rows():
+    assert all(i != 1 for i, _ in _index().search("LC-MS/MS LLOQ", 4, exclude={1}))
+
+def test_combine_renumbers_rows():
+    a, b = _index(), _index()
+    out = BM25Index.combine([(a, [0, 2]), (b, [3])])
+    assert len(out) == 3
+    assert out.search("washout", 1)[0][0] == 1
+    assert out.search("neutropenia", 1)[0][0] == 2
+    assert out.search("LLOQ", 3) == []
+
+def test_save_load_roundtrip(tmp_path):
+    bm = _index()
+    path = str(tmp_path / "bm25.npz")
+    bm.save(path)
+    loaded = BM25Index.load(path)
+    for q in ("fed Cmax", "washout days", "LC-MS/MS"):
+        assert loaded.search(q, 4) == bm.search(q, 4)
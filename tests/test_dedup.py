@@ -0,0 +1,38 @@
+from src.synopsis_gen.rag.dedup import article_ids, dedupe_near_duplicates
+
+ABSTRACT = "Palbociclib exposure increased under fed conditions in a randomized crossover study of healthy volunteers"
+
+def test_article_ids_from_fields_and_urls():
+    assert article_ids({"source": "PubMed", "id": "123", "url": "https://pubmed.ncbi.nlm.nih.gov/123/"}) == ["pmid:123"]
+    assert article_ids({"url": "https://pmc.ncbi.nlm.nih.gov/articles/pmc42/"}) == ["pmcid:PMC42"]
+
+def test_id_match_keeps_fullest_and_merges_fields():
+    abstract = {
+        "source": "PubMed", "id": "123", "pmid": "123", "pmcid": "PMC9", "year": "2019", "text": ABSTRACT,
+        "journal": "Clin Pharmacokinet", "pub_date": "2019-03-05", "mesh": ["Food-Drug Interactions"],
+    }
+    full = {"source": "PMC", "id": "PMC9", "pmcid": "PMC9", "text": ABSTRACT + ". " + "Full text body. " * 50}
+    kept, report = dedupe_near_duplicates([abstract, full])
+    assert len(kept) == 1 and report["id_matches"] == 1
+    doc = kept[0]
+    assert doc["source"] == "PMC"
+    assert (doc["pmid"], doc["year"], doc["journal"], doc["pub_date"]) == ("123", "2019", "Clin Pharmacokinet", "2019-03-05")
+    assert doc["mesh"] == ["Food-Drug Interactions"]
+
+def test_near_duplicate_text_without_ids():
+    text = ABSTRACT + " " + "with additional shared wording repeated across both copies " * 5
+    kept, report = dedupe_near_duplicates([
+        {"source": "URL", "id": "a", "text": text},
+        {"source": "URL", "id": "b", "text": text + " end"},
+        {"source": "URL", "id": "c", "text": "Completely different document about bioanalytical LC-MS/MS validation and stability"},
+    ])
+    assert [d["id"] for d in kept] == ["b", "c"]
+    assert report["near_duplicates"] == 1
+
+def test_reference_synopsis_always_kept():
+    text = ABSTRACT + " " + "with additional shared wording repeated across both copies " * 5
+    kept, _ = dedupe_near_duplicates([
+        {"source": "URL", "id": "x", "text": text + " end"},
+        {"source": "SYNOPSIS_DOCX", "id": "s", "text": text},
+    ])
+    assert len(kept) == 1 and kept[0]["source"] == "SYNOPSIS_DOCX"
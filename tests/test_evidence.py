@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from src.synopsis_gen.rag.evidence import EMPTY_EVIDENCE, estimate_tokens, pack_evidence
+from src.synopsis_gen.rag.mini_rag import Chunk
+
+def _chunk(i: int, text: str, doc: str = "1", **meta) -> Chunk:
+    return Chunk(chunk_id=f"c{i}", text=text, meta={"source": "PubMed", "id": doc, "url": f"https://pubmed.ncbi.nlm.nih.gov/{doc}/", **meta})
+
+def test_empty_hits():
+    text, report = pack_evidence([], budget=100)
+    assert text == EMPTY_EVIDENCE
+    assert report["snippets"] == 0 and report["candidates"] == 0
+
+def test_report_counts_budget():
+    hits = [(_chunk(i, f"distinct finding number {i} " * 20, doc=str(i)), 1.0 - i / 10) for i in range(5)]
+    text, report = pack_evidence(hits, budget=400)
+    assert report["tokens"] <= 400
+    assert report["snippets"] == 2 and report["over_budget"] == 3
+    assert report["tokens"] == estimate_tokens(text)
+
+def test_near_duplicates_dropped():
+    body = "cmax and auc were bioequivalent under fed conditions in healthy volunteers " * 3
+    hits = [(_chunk(0, body, doc="1"), 0.9), (_chunk(1, body + "extra", doc="2"), 0.8)]
+    _, report = pack_evidence(hits, budget=10_000)
+    assert report["snippets"] == 1 and report["duplicates"] == 1
+
+def test_seen_documents_skipped_across_sections():
+    seen = set()
+    hits = [(_chunk(0, "first section evidence about washout period", doc="7"), 0.5)]
+    pack_evidence(hits, budget=10_000, seen=seen)
+    text, report = pack_evidence(hits, budget=10_000, seen=seen)
+    assert text == EMPTY_EVIDENCE and report["duplicates"] == 1
+
+def test_section_in_label():
+    text, _ = pack_evidence([(_chunk(0, "plasma samples were analysed by LC-MS/MS", section="Methods"), 1.0)], budget=10_000)
+    assert "— Methods" in text.splitlines()[0]
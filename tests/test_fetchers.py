@@ -0,0 +1,53 @@
+import requests
+
+from src.synopsis_gen.sources import fetchers
+from src.synopsis_gen.sources.fetchers import _html_text, fetch_url_doc
+from src.synopsis_gen.text_utils import iter_chunks
+
+def _response(html: str) -> requests.Response:
+    r = requests.Response()
+    r._content = html.encode("utf-8")
+    r.encoding = "utf-8"
+    return r
+
+PAGE = """<html><body><script>track()</script><nav>Menu</nav><article>
+<h2>Methods</h2>
+<p>Healthy   volunteers were
+   enrolled <a href="#b1">[1]</a>.</p>
+<p>Plasma was analysed by <em>LC-MS/MS</em>.</p>
+<h2>Results</h2><ul><li>Cmax</li><li>AUC</li></ul>
+</article></body></html>"""
+
+def test_html_keeps_block_boundaries():
+    text = _html_text(_response(PAGE), 0, article=True)
+    assert text.split("\n\n") == [
+        "Methods",
+        "Healthy volunteers were enrolled [1].",
+        "Plasma was analysed by LC-MS/MS.",
+        "Results",
+        "Cmax",
+        "AUC",
+    ]
+
+def test_html_article_only_and_clipped():
+    assert "Menu" in _html_text(_response(PAGE), 0)
+    assert "Menu" not in _html_text(_response(PAGE), 0, article=True)
+    assert len(_html_text(_response(PAGE), 20)) == 20
+
+def test_html_sections_reach_chunker():
+    body = "".join(f"<p>{'Finding number %d was observed. ' % i * 4}</p>" for i in range(8))
+    text = _html_text(_response(f"<html><body><h2>Methods</h2>{body}<h2>Results</h2>{body}</body></html>"), 0)
+    chunks = [c for _, _, c in iter_chunks(text, chunk_size=400, overlap=0)]
+    assert any(c.startswith("Results") for c in chunks)
+
+def test_pmc_seed_url_keeps_jats_sections(monkeypatch):
+    seen = []
+
+    def fake_fulltext(pmcid, max_chars=0):
+        seen.append(pmcid)
+        return {"text": "Methods\n\nCrossover study.", "sections": [[0, "Methods"]]}
+
+    monkeypatch.setattr(fetchers, "europepmc_fulltext", fake_fulltext)
+    doc = fetch_url_doc("https://pmc.ncbi.nlm.nih.gov/articles/pmc4613960/")
+    assert seen == ["PMC4613960"]
+    assert doc == {"text": "Methods\n\nCrossover study.", "sections": [[0, "Methods"]], "pmcid": "PMC4613960"}
@@ -0,0 +1,43 @@
+import threading
+
+import requests
+
+from src.synopsis_gen.http_cache import HttpCache
+
+def _response(body: bytes, etag: str = '"v1"') -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r.url = "https://example.org/a"
+    r._content = body
+    r.headers["ETag"] = etag
+    return r
+
+def test_lookup_store_revalidate(tmp_path):
+    cache = HttpCache(cache_dir=str(tmp_path), ttls={"default": 3600})
+    assert cache.lookup("https://example.org/a") == (None, False)
+    cache.store("https://example.org/a", None, _response(b"body"))
+    entry, fresh = cache.lookup("https://example.org/a")
+    assert fresh and entry.body == b"body"
+    cache.store("https://example.org/b", None, _response(b""), keep=False)
+    assert cache.get("https://example.org/b") is None
+    stale = HttpCache(cache_dir=str(tmp_path), ttls={"default": 0})
+    entry, fresh = stale.lookup("https://example.org/a")
+    assert not fresh and entry.validators() == {"If-None-Match": '"v1"'}
+    stale.revalidate(entry)
+    assert cache.stats() == {"hits": 1, "misses": 2, "revalidated": 0}
+    assert stale.stats() == {"hits": 0, "misses": 0, "revalidated": 1}
+
+def test_counters_are_exact_under_threads(tmp_path):
+    cache = HttpCache(cache_dir=str(tmp_path), ttls={"default": 3600})
+    cache.store("https://example.org/a", None, _response(b"body"))
+
+    def worker():
+        for _ in range(200):
+            cache.lookup("https://example.org/a")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.hits == 1600
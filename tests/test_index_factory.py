@@ -0,0 +1,23 @@
+import faiss
+import numpy as np
+
+from src.synopsis_gen.rag.index_factory import build_index, index_vectors
+
+def _emb(n: int = 800, d: int = 16) -> np.ndarray:
+    x = np.random.default_rng(0).random((n, d), dtype="float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def test_ivf_vectors_read_without_mutating_index():
+    emb = _emb()
+    index = build_index(emb, kind="ivf_flat")
+    ivf = faiss.try_extract_index_ivf(index)
+    assert ivf is not None and not ivf.direct_map.no()
+    assert np.allclose(index_vectors(index), emb, atol=1e-6)
+
+def test_index_without_direct_map_is_left_untouched():
+    emb = _emb()
+    index = faiss.index_factory(emb.shape[1], "IVF8,Flat", faiss.METRIC_INNER_PRODUCT)
+    index.train(emb)
+    index.add(emb)
+    assert np.allclose(index_vectors(index), emb, atol=1e-6)
+    assert faiss.try_extract_index_ivf(index).direct_map.no()
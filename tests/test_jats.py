@@ -0,0 +1,40 @@
+from src.synopsis_gen.sources.jats import join_sections, parse_jats_sections
+
+JATS = b"""<?xml version="1.0"?>
+<article><front><article-meta><title-group><article-title>Ignored</article-title></title-group>
+<abstract><p>Abstract text is skipped.</p></abstract></article-meta></front>
+<body>
+<sec><title>Introduction</title><p>Palbociclib is a CDK4/6 inhibitor <xref ref-type="bibr" rid="b1">[1]</xref>.</p></sec>
+<sec><title>Methods</title>
+  <sec><title>Study design</title><p>Open-label crossover (<xref ref-type="bibr" rid="b2">2</xref>, <xref ref-type="bibr" rid="b3">3</xref>) study.</p></sec>
+  <p>Plasma was analysed <xref ref-type="fig" rid="f1">Fig. 1</xref>.</p>
+  <table-wrap><caption><p>Table 1. PK parameters</p></caption><table><tr><td>Cmax</td></tr></table></table-wrap>
+  <disp-formula>x = y</disp-formula>
+</sec>
+</body>
+<back><ref-list><ref id="b1">Reference</ref></ref-list></back></article>"""
+
+def test_sections_and_titles():
+    sections = parse_jats_sections(JATS)
+    assert [s["title"] for s in sections] == ["Introduction", "Methods"]
+    assert sections[0]["text"] == "Palbociclib is a CDK4/6 inhibitor."
+    methods = sections[1]["text"].split("\n")
+    assert methods == ["Study design", "Open-label crossover study.", "Plasma was analysed Fig. 1.", "Table 1. PK parameters"]
+
+def test_front_and_back_skipped():
+    text = " ".join(s["text"] for s in parse_jats_sections(JATS))
+    assert "Abstract text" not in text and "Reference" not in text and "x = y" not in text
+
+def test_loose_body_paragraphs():
+    sections = parse_jats_sections(b"<article><body><p>Short report.</p><p>Second paragraph.</p></body></article>")
+    assert sections == [{"title": "", "text": "Short report.\nSecond paragraph."}]
+
+def test_join_sections_offsets():
+    sections = parse_jats_sections(JATS)
+    doc = join_sections(sections, max_chars=0)
+    assert [title for _, title in doc["sections"]] == ["Introduction", "Methods"]
+    for (start, _), sec in zip(doc["sections"], sections):
+        assert doc["text"][start:].startswith(sec["text"])
+    assert "\n\n" in doc["text"]
+    assert join_sections([], 100) is None
+    assert len(join_sections(parse_jats_sections(JATS), max_chars=20)["text"]) == 20
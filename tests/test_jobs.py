@@ -0,0 +1,46 @@
+from src.synopsis_gen.artifacts import ArtifactStore
+from src.synopsis_gen.jobs import JobQueue
+
+def _fake_pipeline(out_path: str, progress=None):
+    progress("retrieval", "running")
+    progress("retrieval", "done", evidence={"a": {"budget": 100, "tokens": 80, "snippets": 2}})
+    with open(out_path, "wb") as f:
+        f.write(b"docx")
+    return out_path
+
+def test_evidence_report_in_job(tmp_path):
+    queue = JobQueue(workers=1, store=ArtifactStore(root=str(tmp_path)))
+    job = queue.submit(_fake_pipeline)
+    queue._pool.shutdown(wait=True)
+    out = job.to_dict()
+    assert out["status"] == "done"
+    assert out["stages"]["retrieval"] == "done"
+    assert out["evidence"]["a"]["tokens"] == 80
+
+def _partial_pipeline(out_path: str, progress=None):
+    progress("section_c", "running")
+    progress("section_c", "failed", section_errors={"c": "LLM did not return valid JSON"})
+    with open(out_path, "wb") as f:
+        f.write(b"docx")
+    return out_path
+
+def test_section_errors_mark_job_incomplete(tmp_path):
+    queue = JobQueue(workers=1, store=ArtifactStore(root=str(tmp_path)))
+    job = queue.submit(_partial_pipeline)
+    queue._pool.shutdown(wait=True)
+    out = job.to_dict()
+    assert out["status"] == "done"
+    assert out["incomplete"] is True
+    assert out["section_errors"] == {"c": "LLM did not return valid JSON"}
+
+def test_job_owns_artifact_expiry(tmp_path):
+    store = ArtifactStore(root=str(tmp_path), ttl=0)
+    queue = JobQueue(workers=1, store=store, ttl=3600)
+    job = queue.submit(_fake_pipeline)
+    queue._pool.shutdown(wait=True)
+    # mtime-очистка хранилища не удаляет документ живой задачи
+    store.cleanup()
+    assert store.get(job.job_id) is not None
+    queue.ttl = 0
+    assert queue.get(job.job_id) is None
+    assert store.get(job.job_id) is None
@@ -0,0 +1,63 @@
+import pytest
+
+from src.synopsis_gen.llm import json_utils
+from src.synopsis_gen.llm.json_utils import JsonStreamValidator, llm_json, try_parse_json
+from src.synopsis_gen.llm.response_cache import LlmResponseCache
+
+class FakeLLM:
+    model_uri = "gpt://folder/model"
+
+    def __init__(self, answer: str, use_cache: bool = True):
+        self.answer = answer
+        self.use_cache = use_cache
+        self.calls = []
+
+    def chat(self, system, user, temperature, max_tokens):
+        self.calls.append((temperature, max_tokens))
+        return self.answer
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LlmResponseCache(cache_dir=str(tmp_path))
+    monkeypatch.setattr(json_utils, "LLM_CACHE", cache)
+    monkeypatch.setattr(json_utils, "LLM_STREAM", False)
+    return cache
+
+def test_validator_accepts_object_fed_in_pieces():
+    v = JsonStreamValidator()
+    text = 'Ответ: {"a": [1, {"b": "x}"}], "c": "\\"q\\""} хвост'
+    for i in range(1, len(text) + 1):
+        v.feed(text[:i])
+    assert v.started and v.closed
+
+def test_validator_rejects_unbalanced():
+    with pytest.raises(ValueError):
+        JsonStreamValidator().feed('{"a": [1, 2}')
+
+def test_validator_rejects_newline_in_string():
+    with pytest.raises(ValueError):
+        JsonStreamValidator().feed('{"a": "line\nbreak"}')
+
+def test_validator_rejects_missing_object():
+    with pytest.raises(ValueError):
+        JsonStreamValidator(prefix_chars=10).feed("no json here at all")
+
+def test_try_parse_json_strips_wrapping():
+    assert try_parse_json('```json\n{"a": 1}\n```') == {"a": 1}
+
+def test_cache_key_uses_call_parameters(cache):
+    llm = FakeLLM('{"a": 1}')
+    llm_json(llm, "sys", "user", temperature=0.1, max_tokens=100)
+    llm_json(llm, "sys", "user", temperature=0.1, max_tokens=100)
+    llm_json(llm, "sys", "user", temperature=0.7, max_tokens=100)
+    llm_json(llm, "sys", "user", temperature=0.1, max_tokens=200)
+    assert llm.calls == [(0.1, 100), (0.7, 100), (0.1, 200)]
+    assert cache.hits == 1
+
+def test_no_cache_skips_read_and_write(cache):
+    llm_json(FakeLLM('{"a": 1}'), "sys", "user")
+    fresh = FakeLLM('{"a": 2}', use_cache=False)
+    assert llm_json(fresh, "sys", "user") == {"a": 2}
+    assert len(fresh.calls) == 1
+    assert cache.stores == 1
+    assert llm_json(FakeLLM('{"a": 3}'), "sys", "user") == {"a": 1}
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from src.synopsis_gen.rag.mini_rag import MiniRAG, doc_key
+
+class HashEncoder:
+    # детерминированные векторы по словам текста — без загрузки модели
+    dim = 32
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, normalize_embeddings=False, **_):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, hash(w) % self.dim] += 1.0
+        out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+def _doc(doc_id: str, text: str) -> dict:
+    return {"source": "URL", "id": doc_id, "url": f"https://example.org/{doc_id}", "text": text}
+
+def test_shared_chunk_survives_removal_of_other_document():
+    rag = MiniRAG(model=HashEncoder())
+    rag.add_documents([_doc("a", "Cmax was 120 ng/mL."), _doc("b", "Cmax was 120 ng/mL.")])
+    assert all(e["rows"][1] > e["rows"][0] for e in rag.docs.values())
+    rag.update_documents([_doc("b", "Cmax was 120 ng/mL.")])
+    assert [m["id"] for m in rag.live_metas()] == ["b"]
+    assert [c.meta["id"] for c in rag.search("Cmax", top_k=3)] == ["b"]
+
+def test_update_keeps_only_failed_documents():
+    rag = MiniRAG(model=HashEncoder())
+    a, b = _doc("a", "Tmax was 2 h."), _doc("b", "Half-life was 27 h.")
+    rag.add_documents([a, b, _doc("c", "AUC was stable.")])
+    # a не загрузился, b исчез из выдачи: хранится только a
+    rag.update_documents([_doc("c", "AUC was stable.")], keep={doc_key(a)})
+    assert sorted(m["id"] for m in rag.live_metas()) == ["a", "c"]
+    rag.update_documents([], keep={"URL"})
+    assert sorted(m["id"] for m in rag.live_metas()) == ["a", "c"]
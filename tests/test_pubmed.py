@@ -0,0 +1,97 @@
+import json
+
+import requests
+
+from src.synopsis_gen.http_cache import HttpCache
+from src.synopsis_gen.sources import pubmed
+from src.synopsis_gen.sources.pubmed import iter_pubmed_articles, pubmed_fetch_abstracts, pubmed_search
+
+def _article(pmid: str, pmcid: str = "", month: str = "Mar") -> str:
+    pmc = f'<ArticleId IdType="pmc">{pmcid}</ArticleId>' if pmcid else ""
+    return f"""<PubmedArticle><MedlineCitation><PMID>{pmid}</PMID><Article>
+<Journal><Title>Clin  Pharmacokinet</Title><JournalIssue><PubDate><Year>2019</Year><Month>{month}</Month><Day>5</Day></PubDate></JournalIssue></Journal>
+<ArticleTitle>Food effect on <i>palbociclib</i></ArticleTitle>
+<Abstract><AbstractText Label="METHODS">Crossover   study.</AbstractText><AbstractText Label="RESULTS">AUC rose.</AbstractText></Abstract>
+</Article><MeshHeadingList><MeshHeading><DescriptorName>Food-Drug Interactions</DescriptorName></MeshHeading></MeshHeadingList>
+</MedlineCitation><PubmedData><ArticleIdList><ArticleId IdType="pubmed">{pmid}</ArticleId>{pmc}</ArticleIdList></PubmedData></PubmedArticle>"""
+
+def _set(*articles: str) -> bytes:
+    return f'<?xml version="1.0"?><PubmedArticleSet>{"".join(articles)}</PubmedArticleSet>'.encode("utf-8")
+
+def test_article_fields():
+    (doc,) = iter_pubmed_articles(_set(_article("123", "PMC456")))
+    assert doc["pmid"] == doc["id"] == "123"
+    assert doc["pmcid"] == "PMC456"
+    assert doc["journal"] == "Clin Pharmacokinet"
+    assert doc["pub_date"] == "2019-03-05" and doc["year"] == "2019"
+    assert doc["mesh"] == ["Food-Drug Interactions"]
+    assert doc["text"] == "Food effect on palbociclib. METHODS: Crossover study. RESULTS: AUC rose."
+
+def test_numeric_month_and_stream_order():
+    docs = list(iter_pubmed_articles(_set(_article("1", month="07"), _article("2"))))
+    assert [d["pmid"] for d in docs] == ["1", "2"]
+    assert docs[0]["pub_date"] == "2019-07-05" and docs[0]["pmcid"] == ""
+
+def test_truncated_xml_keeps_complete_records():
+    data = _set(_article("1"), _article("2"))[:-60]
+    assert [d["pmid"] for d in iter_pubmed_articles(data)][:1] == ["1"]
+
+class _FakeNcbi:
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def __call__(self, url, params, timeout=60, post=False, cache=True):
+        self.calls.append(params)
+        ids = params["id"].split(",") if "id" in params else self.records[int(params["retstart"]):][:int(params["retmax"])]
+        r = requests.Response()
+        r.status_code = 200
+        r.url = url
+        r._content = _set(*(_article(i) for i in ids))
+        return r
+
+def test_efetch_cache_keyed_by_pmid_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(pubmed, "HTTP_CACHE", HttpCache(cache_dir=str(tmp_path)))
+    fake = _FakeNcbi(["1", "2"])
+    monkeypatch.setattr(pubmed, "ncbi_get", fake)
+    search = {"ids": ["1", "2"], "webenv": "W1", "topics": [{"term": "palbociclib", "ids": ["1", "2"], "query_key": "1"}]}
+    assert [d["pmid"] for d in pubmed_fetch_abstracts(search)] == ["1", "2"]
+    # тот же термин, но поиск вернул другие статьи — старый ответ не подставляется
+    fake.records = ["3", "4"]
+    search = {"ids": ["3", "4"], "webenv": "W2", "topics": [{"term": "palbociclib", "ids": ["3", "4"], "query_key": "1"}]}
+    assert [d["pmid"] for d in pubmed_fetch_abstracts(search)] == ["3", "4"]
+    # те же PMID по списку берутся из кэша, записанного при запросе по WebEnv
+    calls = len(fake.calls)
+    assert [d["pmid"] for d in pubmed_fetch_abstracts(["1", "2"])] == ["1", "2"]
+    assert len(fake.calls) == calls
+
+def test_webenv_window_with_other_pmids_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(pubmed, "HTTP_CACHE", HttpCache(cache_dir=str(tmp_path)))
+    # на history server окно уже указывает на другие статьи, чем вернул esearch
+    fake = _FakeNcbi(["7", "8"])
+    monkeypatch.setattr(pubmed, "ncbi_get", fake)
+    search = {"ids": ["1", "2"], "webenv": "W1", "topics": [{"term": "t", "ids": ["1", "2"], "query_key": "1"}]}
+    assert [d["pmid"] for d in pubmed_fetch_abstracts(search)] == ["1", "2"]
+    assert fake.calls[-1]["id"] == "1,2"
+    entry, _ = pubmed.HTTP_CACHE.lookup(pubmed.EFETCH_URL, {"db": "pubmed", "id": "1,2"})
+    assert [d["pmid"] for d in iter_pubmed_articles(entry.body)] == ["1", "2"]
+
+def test_search_keeps_per_topic_quota(monkeypatch):
+    calls = []
+
+    def fake_esearch(url, params, timeout=60, post=False, cache=True):
+        calls.append(params)
+        n = len(calls)
+        r = requests.Response()
+        r.status_code = 200
+        ids = [f"{n}{i:02d}" for i in range(int(params["retmax"]))] + (["100"] if n > 1 else [])
+        r._content = json.dumps({"esearchresult": {"idlist": ids, "count": "50", "webenv": "W1", "querykey": str(n)}}).encode()
+        return r
+
+    monkeypatch.setattr(pubmed, "ncbi_get", fake_esearch)
+    search = pubmed_search(["pk", "be", "safety"], retmax=24)
+    assert [len(t["ids"]) for t in search["topics"]] == [12, 13, 13]
+    assert [t["query_key"] for t in search["topics"]] == ["1", "2", "3"]
+    # все темы — на одном WebEnv; общая статья в ids один раз
+    assert "WebEnv" not in calls[0] and calls[1]["WebEnv"] == calls[2]["WebEnv"] == "W1"
+    assert len(search["ids"]) == 36 and search["count"] == 150
@@ -0,0 +1,31 @@
+import time
+
+from src.synopsis_gen.ratelimit import TokenBucket
+
+def _count_in_first_second(bucket: TokenBucket) -> int:
+    start = time.monotonic()
+    n = 0
+    while True:
+        bucket.acquire()
+        if time.monotonic() - start >= 1.0:
+            return n
+        n += 1
+
+def test_default_burst_stays_under_ncbi_limit_without_key():
+    assert _count_in_first_second(TokenBucket(2.8)) <= 3
+
+def test_default_burst_stays_under_ncbi_limit_with_key():
+    assert _count_in_first_second(TokenBucket(9)) <= 10
+
+def test_first_request_is_not_delayed():
+    bucket = TokenBucket(2.0)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+def test_penalize_blocks_all_acquirers():
+    bucket = TokenBucket(100.0)
+    bucket.penalize(0.3)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.25
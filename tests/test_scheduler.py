@@ -0,0 +1,39 @@
+import time
+import threading
+
+from src.synopsis_gen.sources.scheduler import FetchScheduler
+
+def test_busy_host_does_not_block_other_hosts():
+    sched = FetchScheduler(max_in_flight=2, per_host=1)
+    gate = threading.Event()
+    slow = [sched.submit("a.example", gate.wait, 5) for _ in range(10)]
+    fast = sched.submit("b.example", lambda: "ok")
+    assert sched.gather([fast], deadline=1.0) == ["ok"]
+    gate.set()
+    assert all(sched.gather(slow, deadline=5.0))
+
+def test_per_host_limit_is_respected():
+    sched = FetchScheduler(max_in_flight=8, per_host=2)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def task():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    sched.gather([sched.submit("a.example", task) for _ in range(8)], deadline=5.0)
+    assert peak[0] == 2
+
+def test_deadline_counts_from_since_and_failures_use_default():
+    sched = FetchScheduler(max_in_flight=2, per_host=2)
+    started = time.monotonic() - 10.0
+    slow = sched.submit("a.example", time.sleep, 1.0)
+    t0 = time.monotonic()
+    assert sched.gather([slow], deadline=5.0, default="late", since=started) == ["late"]
+    assert time.monotonic() - t0 < 0.5
+    boom = sched.submit("b.example", lambda: 1 / 0)
+    assert sched.gather([boom], deadline=1.0, default="failed") == ["failed"]
@@ -0,0 +1,23 @@
+from src.synopsis_gen.config import parse_kv
+from src.synopsis_gen.llm.response_cache import LlmResponseCache
+from src.synopsis_gen.sqlite_lru import SqliteLruStore
+
+def test_parse_kv():
+    assert parse_kv(" Example.org=3, bad , x=, y=abc,default=1.5", float, lower=True) == {"example.org": 3.0, "default": 1.5}
+    assert parse_kv("a=2500,E=4000", int) == {"a": 2500, "E": 4000}
+    assert parse_kv("") == {}
+
+def test_lru_evicts_least_recently_read(tmp_path):
+    store = SqliteLruStore(str(tmp_path / "s.sqlite"), {"value": "TEXT"}, max_bytes=10)
+    store.put("a", {"value": "aaaa"}, size=4)
+    store.put("b", {"value": "bbbb"}, size=4)
+    assert store.get("a")["value"] == "aaaa"
+    store.put("c", {"value": "cccc"}, size=4)
+    assert store.get("b") is None and store.get("a") is not None and store.get("c") is not None
+    assert not store.put("big", {"value": "x" * 11}, size=11)
+
+def test_llm_cache_ttl(tmp_path):
+    cache = LlmResponseCache(cache_dir=str(tmp_path), ttl=0)
+    cache.put("k", "gpt://m", "ответ")
+    assert cache.get("k") is None
+    assert cache.stats() == {"hits": 0, "misses": 1, "stores": 1}
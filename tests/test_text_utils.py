@@ -0,0 +1,39 @@
+from src.synopsis_gen.text_utils import iter_chunks, normalize_space
+
+def _sentences(n: int, word: str = "Sentence") -> str:
+    return " ".join(f"{word} number {i} has some text." for i in range(n))
+
+def test_short_text_is_one_chunk():
+    assert list(iter_chunks("  Short   text.\n")) == [(2, 15, "Short text.")]
+
+def test_offsets_point_into_source():
+    text = _sentences(40)
+    chunks = list(iter_chunks(text, chunk_size=200, overlap=50))
+    assert len(chunks) > 1
+    for start, end, chunk in chunks:
+        assert len(chunk) <= 200
+        assert normalize_space(text[start:end]) == chunk
+
+def test_chunks_end_on_sentence_boundary():
+    for _, _, chunk in iter_chunks(_sentences(40), chunk_size=200, overlap=50):
+        assert chunk.endswith(".")
+
+def test_overlap_repeats_tail_sentences():
+    chunks = list(iter_chunks(_sentences(40), chunk_size=200, overlap=60))
+    for (_, prev_end, _), (start, _, _) in zip(chunks, chunks[1:]):
+        assert start < prev_end
+
+def test_decimals_not_split():
+    text = "Dose was 0.5 mg. " * 30
+    for _, _, chunk in iter_chunks(text, chunk_size=100, overlap=0):
+        assert not chunk.startswith("5 mg")
+
+def test_blank_line_starts_new_chunk():
+    text = _sentences(5, "Methods") + "\n\n" + _sentences(5, "Results")
+    chunks = [c for _, _, c in iter_chunks(text, chunk_size=300, overlap=0)]
+    assert any(c.startswith("Results") for c in chunks)
+    assert not any("Methods" in c and "Results" in c for c in chunks)
+
+def test_long_sentence_is_split():
+    chunks = list(iter_chunks("word " * 200 + ".", chunk_size=100, overlap=0))
+    assert all(len(c) <= 100 for _, _, c in chunks)